@@ -7,6 +7,7 @@ to the Google Sheet, with an additional business_key column for linking back
 to the source raw data.
 """
 
+import argparse
 import logging
 import sys
 from pathlib import Path
@@ -15,6 +16,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
 from src.budget_updater.config import Config
 
 # Configure logging
@@ -24,6 +26,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Target layout: monthly partitions, clustered on the dedup join key
+SHEET_TRANSACTIONS_CLUSTERING = ["source_bank", "business_key"]
+
 
 def create_sheet_transactions_table(client: bigquery.Client, dataset_id: str, project_id: str):
     """
@@ -90,16 +95,16 @@ def create_sheet_transactions_table(client: bigquery.Client, dataset_id: str, pr
     - Exact match to Google Sheet TARGET_COLUMNS structure
     - business_key for linking to raw staging tables
     - Additional analysis columns for reporting
-    - Clustered for efficient querying by date and account
+    - Partitioned by month and clustered for cheap business_key dedup joins
     """
     
-    # Set up clustering for query performance
-    table.clustering_fields = ["transaction_month", "account", "source_bank"]
+    # Cluster on the dedup join key so transforms only read matching blocks
+    table.clustering_fields = SHEET_TRANSACTIONS_CLUSTERING
     
-    # Set up partitioning by date for large datasets
+    # Monthly partitions let the transform's dedup join prune to the months it loads
     table.time_partitioning = bigquery.TimePartitioning(
-        type_=bigquery.TimePartitioningType.DAY,
-        field="date"
+        type_=bigquery.TimePartitioningType.MONTH,
+        field="transaction_month"
     )
     
     try:
@@ -108,8 +113,8 @@ def create_sheet_transactions_table(client: bigquery.Client, dataset_id: str, pr
         
         # Log table details
         logger.info(f"📊 Table details:")
-        logger.info(f"   - Partitioned by: date (daily)")
-        logger.info(f"   - Clustered by: transaction_month, account, source_bank")
+        logger.info(f"   - Partitioned by: transaction_month (monthly)")
+        logger.info(f"   - Clustered by: {', '.join(SHEET_TRANSACTIONS_CLUSTERING)}")
         logger.info(f"   - Schema fields: {len(schema)}")
         logger.info(f"   - Description: {table.description[:100]}...")
         
@@ -120,6 +125,66 @@ def create_sheet_transactions_table(client: bigquery.Client, dataset_id: str, pr
         raise
 
 
+def migrate_sheet_transactions_layout(client: bigquery.Client, dataset_id: str, project_id: str) -> bool:
+    """
+    Migrate an existing sheet_transactions table to monthly transaction_month
+    partitions clustered on source_bank, business_key.
+    
+    The copy goes through sheet_transactions_v2. If an earlier run died part way, a
+    stale _v2 next to the intact table is dropped and the copy starts over; a _v2
+    without sheet_transactions (dropped, but not yet renamed) is renamed back.
+    
+    Returns:
+        True if the table was migrated or recovered
+    """
+    fq_prefix = f"{project_id}.{dataset_id}"
+    table_id = f"{fq_prefix}.sheet_transactions"
+    new_table_id = f"{fq_prefix}.sheet_transactions_v2"
+    
+    try:
+        table = client.get_table(table_id)
+    except NotFound:
+        # Raises NotFound as well when there is nothing to recover
+        client.get_table(new_table_id)
+        logger.info("🔧 Finishing interrupted migration: renaming sheet_transactions_v2...")
+        client.query(f"ALTER TABLE `{new_table_id}` RENAME TO sheet_transactions").result()
+        logger.info("✅ sheet_transactions restored from sheet_transactions_v2")
+        return True
+    
+    partitioning = table.time_partitioning
+    if (partitioning is not None and partitioning.field == "transaction_month"
+            and table.clustering_fields == SHEET_TRANSACTIONS_CLUSTERING):
+        logger.info("ℹ️  sheet_transactions already partitioned by transaction_month")
+        return False
+    
+    logger.info("🔧 Migrating sheet_transactions to monthly partitions...")
+    
+    # Left over from an interrupted run while the original is intact; start over
+    client.delete_table(new_table_id, not_found_ok=True)
+    
+    # Copy schema and description so REQUIRED modes and column docs survive
+    new_table = bigquery.Table(new_table_id, schema=table.schema)
+    new_table.description = table.description
+    new_table.time_partitioning = bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.MONTH,
+        field="transaction_month"
+    )
+    new_table.clustering_fields = SHEET_TRANSACTIONS_CLUSTERING
+    client.create_table(new_table, exists_ok=False)
+    
+    # The script stops at the first failing statement, so the old table is only
+    # dropped once the copy has succeeded
+    client.query(f"""
+    INSERT INTO `{new_table_id}`
+    SELECT * FROM `{table_id}`;
+    DROP TABLE `{table_id}`;
+    ALTER TABLE `{new_table_id}` RENAME TO sheet_transactions;
+    """).result()
+    
+    logger.info("✅ sheet_transactions now partitioned by transaction_month")
+    return True
+
+
 def create_sheet_transactions_view(client: bigquery.Client, dataset_id: str, project_id: str):
     """
     Create a view that shows how to link sheet_transactions back to raw data.
@@ -220,6 +285,11 @@ def create_sheet_transactions_view(client: bigquery.Client, dataset_id: str, pro
 
 def main():
     """Create the sheet_transactions table and supporting view."""
+    parser = argparse.ArgumentParser(description="Create the sheet_transactions table and view")
+    parser.add_argument("--migrate-layout", action="store_true",
+                       help="Migrate an existing sheet_transactions table to monthly partitions and clustering")
+    args = parser.parse_args()
+    
     try:
         # Initialize configuration
         config = Config()
@@ -229,6 +299,14 @@ def main():
         
         logger.info(f"🚀 Creating sheet_transactions table in {config.gcp_project_id}.{config.bigquery_dataset_id}")
         
+        # create_table(exists_ok=True) leaves an older table's layout as it is
+        if args.migrate_layout:
+            migrate_sheet_transactions_layout(
+                client,
+                config.bigquery_dataset_id,
+                config.gcp_project_id
+            )
+        
         # Create the main table
         table = create_sheet_transactions_table(
             client, 
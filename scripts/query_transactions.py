@@ -5,61 +5,138 @@ Query transaction data from BigQuery.
 This script provides common queries for analyzing transaction data stored in BigQuery.
 
 Usage:
-    python scripts/query_transactions.py [query_name] [--limit N] [--output csv]
+    python scripts/query_transactions.py [query_name] [--limit N] [--output csv|parquet|arrow]
     
 Examples:
     python scripts/query_transactions.py summary
     python scripts/query_transactions.py recent --limit 10
     python scripts/query_transactions.py by_bank --output csv
+    python scripts/query_transactions.py large --output parquet
 """
 
+from __future__ import annotations
+
 import sys
 import argparse
 from pathlib import Path
 from datetime import datetime, timedelta
-import pandas as pd
-from google.cloud import bigquery
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Union
+
+# pandas, pyarrow and the BigQuery clients are imported where they are used so
+# that argument parsing (and --help) does not pay their import cost
+if TYPE_CHECKING:
+    import pandas as pd
+    from google.cloud import bigquery
 
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 from budget_updater.config import Config
 
+BIGQUERY_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+# Guard against runaway queries: fail instead of billing more than 10 GiB
+MAXIMUM_BYTES_BILLED = 10 * 1024 ** 3
+
 class TransactionQueryManager:
     """Manages common queries for transaction data."""
     
     def __init__(self, config: Config):
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        from google.cloud import bigquery, bigquery_storage
+        
         self.config = config
-        self.client = bigquery.Client(project=config.gcp_project_id)
+        
+        # One set of credentials and one pooled HTTP session for every query this
+        # manager runs; the storage read client shares the same credentials
+        credentials, _ = google.auth.default(scopes=BIGQUERY_SCOPES)
+        self.client = bigquery.Client(
+            project=config.gcp_project_id,
+            credentials=credentials,
+            _http=AuthorizedSession(credentials),
+            default_query_job_config=bigquery.QueryJobConfig(
+                maximum_bytes_billed=MAXIMUM_BYTES_BILLED
+            )
+        )
+        self._bqs = bigquery_storage.BigQueryReadClient(credentials=credentials)
         self.dataset_id = config.bigquery_dataset_id
         self.table_id = "transactions_standardized"  # V2 architecture
         self.full_table_name = f"{config.gcp_project_id}.{config.bigquery_dataset_id}.{self.table_id}"
     
+    def _fetch(self, query: str, job_config: bigquery.QueryJobConfig = None,
+               csv_path: str = None) -> Union[pd.DataFrame, int]:
+        """
+        Run a query and return an Arrow-backed DataFrame via the BQ Storage API.
+        
+        If csv_path is given, record batches are streamed straight to that CSV file
+        without building a DataFrame, and the number of rows written is returned.
+        """
+        import pandas as pd
+        import pyarrow.csv as pa_csv
+        
+        job = self.client.query(query, job_config=job_config)
+        if csv_path is None:
+            table = job.to_arrow(bqstorage_client=self._bqs)
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        
+        writer = None
+        row_count = 0
+        try:
+            for batch in job.result().to_arrow_iterable(bqstorage_client=self._bqs):
+                if not batch.num_rows:
+                    continue
+                if writer is None:
+                    writer = pa_csv.CSVWriter(csv_path, batch.schema)
+                writer.write_batch(batch)
+                row_count += batch.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        return row_count
+    
     def get_summary(self, limit: int = None) -> None:
         """Get summary statistics of all transactions."""
+        from google.cloud import bigquery
+        
         query = f"""
         SELECT 
             source_bank,
             COUNT(*) as transaction_count,
             MIN(transaction_date) as earliest_date,
             MAX(transaction_date) as latest_date,
-            ROUND(SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END), 2) as total_outflow,
-            ROUND(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 2) as total_inflow,
+            ROUND(SUM(IF(amount < 0, amount, 0)), 2) as total_outflow,
+            ROUND(SUM(IF(amount > 0, amount, 0)), 2) as total_inflow,
             ROUND(SUM(amount), 2) as net_amount,
             ROUND(AVG(amount), 2) as avg_amount
         FROM `{self.full_table_name}`
         GROUP BY source_bank
         ORDER BY transaction_count DESC
+        LIMIT @limit
         """
-        if limit:
-            query += f" LIMIT {limit}"
         
-        result = self.client.query(query).result()
+        # LIMIT only accepts a literal or parameter, so the "no limit" default is
+        # applied here to keep the statement text stable for result caching
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("limit", "INT64", limit or 10000),
+        ])
+        table = self.client.query(query, job_config=job_config).to_arrow(bqstorage_client=self._bqs)
         
-        print(f"{'Bank':<12} {'Count':<8} {'Earliest':<12} {'Latest':<12} {'Outflow':<12} {'Inflow':<12} {'Net':<12} {'Avg':<10}")
-        print("-" * 90)
+        lines = [
+            f"{'Bank':<12} {'Count':<8} {'Earliest':<12} {'Latest':<12} {'Outflow':<12} {'Inflow':<12} {'Net':<12} {'Avg':<10}",
+            "-" * 90,
+        ]
         
-        for row in result:
-            print(f"{row.source_bank:<12} {row.transaction_count:<8} {str(row.earliest_date):<12} {str(row.latest_date):<12} {row.total_outflow:<12} {row.total_inflow:<12} {row.net_amount:<12} {row.avg_amount:<10}")
+        columns = table.column_names
+        row_format = (
+            "{source_bank:<12} {transaction_count:<8} {earliest_date!s:<12} {latest_date!s:<12} "
+            "{total_outflow:<12} {total_inflow:<12} {net_amount:<12} {avg_amount:<10}"
+        )
+        lines.extend(
+            row_format.format_map(dict(zip(columns, values)))
+            for values in zip(*(table.column(c).to_pylist() for c in columns))
+        )
+        print("\n".join(lines))
     
     def get_recent_transactions(self, limit: int = 20) -> None:
         """Get most recent transactions across all banks."""
@@ -75,19 +152,33 @@ class TransactionQueryManager:
         LIMIT {limit}
         """
         
-        result = self.client.query(query).result()
+        table = self.client.query(query).to_arrow(bqstorage_client=self._bqs)
         
-        print(f"{'Date':<12} {'Bank':<8} {'Description':<40} {'Amount':<12} {'Currency':<8}")
-        print("-" * 85)
+        lines = [
+            f"{'Date':<12} {'Bank':<8} {'Description':<40} {'Amount':<12} {'Currency':<8}",
+            "-" * 85,
+        ]
         
-        for row in result:
-            desc = (row.description[:37] + "...") if len(row.description) > 40 else row.description
-            print(f"{str(row.transaction_date):<12} {row.source_bank:<8} {desc:<40} {row.amount:<12} {row.currency:<8}")
+        row_format = "{!s:<12} {:<8} {:<40} {:<12} {:<8}"
+        columns = ("transaction_date", "source_bank", "description", "amount", "currency")
+        for date, bank, desc, amount, currency in zip(*(table.column(c).to_pylist() for c in columns)):
+            desc = (desc[:37] + "...") if len(desc) > 40 else desc
+            lines.append(row_format.format(date, bank, desc, amount, currency))
+        print("\n".join(lines))
     
-    def get_transactions_by_bank(self, bank: str = None, limit: int = None) -> pd.DataFrame:
+    def get_transactions_by_bank(self, bank: str = None, limit: int = None,
+                                 csv_path: str = None) -> Union[pd.DataFrame, int]:
         """Get transactions for a specific bank or all banks."""
-        where_clause = f"WHERE source_bank = '{bank}'" if bank else ""
-        limit_clause = f"LIMIT {limit}" if limit else ""
+        from google.cloud import bigquery
+        
+        where_clause = "WHERE source_bank = @bank" if bank else ""
+        limit_clause = "LIMIT @limit" if limit else ""
+        
+        query_parameters = []
+        if bank:
+            query_parameters.append(bigquery.ScalarQueryParameter("bank", "STRING", bank))
+        if limit:
+            query_parameters.append(bigquery.ScalarQueryParameter("limit", "INT64", limit))
         
         query = f"""
         SELECT 
@@ -105,28 +196,33 @@ class TransactionQueryManager:
         {limit_clause}
         """
         
-        return self.client.query(query).to_dataframe()
+        job_config = bigquery.QueryJobConfig(query_parameters=query_parameters)
+        return self._fetch(query, job_config, csv_path)
     
-    def get_monthly_summary(self, limit: int = 12) -> pd.DataFrame:
+    def get_monthly_summary(self, limit: int = 12,
+                            csv_path: str = None) -> Union[pd.DataFrame, int]:
         """Get monthly transaction summary using V2 views."""
         query = f"""
         SELECT 
-            year,
-            month,
+            EXTRACT(YEAR FROM month_start) as year,
+            EXTRACT(MONTH FROM month_start) as month,
             source_bank,
             transaction_count,
-            total_expenses,
-            total_income,
-            net_amount
+            ROUND(total_expenses, 2) as total_expenses,
+            ROUND(total_income, 2) as total_income,
+            ROUND(net_amount, 2) as net_amount
         FROM `{self.config.gcp_project_id}.{self.dataset_id}.monthly_summary`
-        ORDER BY year DESC, month DESC, source_bank
+        ORDER BY month_start DESC, source_bank
         LIMIT {limit}
         """
         
-        return self.client.query(query).to_dataframe()
+        return self._fetch(query, csv_path=csv_path)
     
-    def get_large_transactions(self, threshold: float = 1000, limit: int = 50) -> pd.DataFrame:
+    def get_large_transactions(self, threshold: float = 1000, limit: int = 50,
+                               csv_path: str = None) -> Union[pd.DataFrame, int]:
         """Get transactions above a certain threshold."""
+        from google.cloud import bigquery
+        
         query = f"""
         SELECT 
             transaction_date,
@@ -135,14 +231,19 @@ class TransactionQueryManager:
             amount,
             ABS(amount) as abs_amount
         FROM `{self.full_table_name}`
-        WHERE ABS(amount) >= {threshold}
+        WHERE ABS(amount) >= @threshold
         ORDER BY abs_amount DESC
-        LIMIT {limit}
+        LIMIT @limit
         """
         
-        return self.client.query(query).to_dataframe()
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("threshold", "FLOAT64", threshold),
+            bigquery.ScalarQueryParameter("limit", "INT64", limit),
+        ])
+        return self._fetch(query, job_config, csv_path)
     
-    def get_file_processing_status(self, limit: int = 20) -> pd.DataFrame:
+    def get_file_processing_status(self, limit: int = 20,
+                                   csv_path: str = None) -> Union[pd.DataFrame, int]:
         """Get file processing history."""
         query = f"""
         SELECT 
@@ -159,10 +260,19 @@ class TransactionQueryManager:
         LIMIT {limit}
         """
         
-        return self.client.query(query).to_dataframe()
+        return self._fetch(query, csv_path=csv_path)
     
-    def search_transactions(self, search_term: str, limit: int = 50) -> pd.DataFrame:
-        """Search transactions by description."""
+    def search_transactions(self, search_term: str, limit: int = 50,
+                            csv_path: str = None) -> Union[pd.DataFrame, int]:
+        """
+        Search transactions by description or merchant name (case-insensitive).
+        
+        CONTAINS_SUBSTR can use a search index if one exists on the table:
+            CREATE SEARCH INDEX transactions_text_index
+            ON `<project>.<dataset>.transactions_standardized` (description, merchant_name)
+        """
+        from google.cloud import bigquery
+        
         query = f"""
         SELECT 
             transaction_date,
@@ -172,13 +282,69 @@ class TransactionQueryManager:
             merchant_name,
             location
         FROM `{self.full_table_name}`
-        WHERE LOWER(description) LIKE LOWER('%{search_term}%')
-           OR LOWER(merchant_name) LIKE LOWER('%{search_term}%')
+        WHERE CONTAINS_SUBSTR(description, @search)
+           OR CONTAINS_SUBSTR(merchant_name, @search)
         ORDER BY transaction_date DESC
-        LIMIT {limit}
+        LIMIT @limit
         """
         
-        return self.client.query(query).to_dataframe()
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("search", "STRING", search_term),
+            bigquery.ScalarQueryParameter("limit", "INT64", limit),
+        ])
+        return self._fetch(query, job_config, csv_path)
+
+def results_filename(query_name: str, output_format: str) -> str:
+    """Build a timestamped output filename for a query."""
+    return f"query_results_{query_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{output_format}"
+
+def save_results(df: pd.DataFrame, query_name: str, output_format: str) -> str:
+    """Write query results to a timestamped file and return its name."""
+    import pyarrow as pa
+    
+    filename = results_filename(query_name, output_format)
+    
+    if output_format == 'parquet':
+        df.to_parquet(filename, index=False, compression='zstd')
+    elif output_format == 'arrow':
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(filename, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        df.to_csv(filename, index=False)
+    
+    return filename
+
+def emit_results(df: pd.DataFrame, query_name: str, output_format: str) -> None:
+    """Print or save the results of a dataframe query."""
+    if df.empty:
+        print("No results found.")
+        return
+    
+    if output_format != 'table':
+        filename = save_results(df, query_name, output_format)
+        print(f"Results saved to {filename}")
+    else:
+        # Let pandas write straight to stdout instead of building one big string
+        df.to_string(buf=sys.stdout, index=False)
+        print()
+    
+    print(f"\nTotal records: {len(df)}")
+
+def run_dataframe_query(fetch: Callable, query_name: str, output_format: str) -> None:
+    """Run a dataframe query, streaming CSV output straight to file."""
+    if output_format != 'csv':
+        emit_results(fetch(), query_name, output_format)
+        return
+    
+    filename = results_filename(query_name, output_format)
+    row_count = fetch(csv_path=filename)
+    if not row_count:
+        print("No results found.")
+        return
+    
+    print(f"Results saved to {filename}")
+    print(f"\nTotal records: {row_count}")
 
 def main():
     parser = argparse.ArgumentParser(description="Query transaction data from BigQuery")
@@ -191,7 +357,7 @@ def main():
     parser.add_argument("--threshold", type=float, default=1000, 
                        help="Amount threshold for large transactions")
     parser.add_argument("--search", help="Search term for transaction descriptions")
-    parser.add_argument("--output", choices=['table', 'csv'], default='table',
+    parser.add_argument("--output", choices=['table', 'csv', 'parquet', 'arrow'], default='table',
                        help="Output format")
     
     args = parser.parse_args()
@@ -213,100 +379,44 @@ def main():
             query_manager.get_recent_transactions(limit)
             
         elif args.query == 'by_bank':
-            df = query_manager.get_transactions_by_bank(args.bank, args.limit)
             bank_name = args.bank.upper() if args.bank else "ALL BANKS"
             print(f"\n🏦 TRANSACTIONS FOR {bank_name}")
             print("=" * 60)
-            
-            # Output results for dataframe queries
-            if df.empty:
-                print("No results found.")
-            else:
-                if args.output == 'csv':
-                    filename = f"query_results_{args.query}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                    df.to_csv(filename, index=False)
-                    print(f"Results saved to {filename}")
-                else:
-                    print(df.to_string(index=False))
-                
-                print(f"\nTotal records: {len(df)}")
+            run_dataframe_query(
+                partial(query_manager.get_transactions_by_bank, args.bank, args.limit),
+                args.query, args.output
+            )
             
         elif args.query == 'monthly':
             limit = args.limit or 12
-            df = query_manager.get_monthly_summary(limit)
             print(f"\n📈 MONTHLY TRANSACTION SUMMARY (Last {limit} months)")
             print("=" * 60)
-            
-            # Output results for dataframe queries
-            if df.empty:
-                print("No results found.")
-            else:
-                if args.output == 'csv':
-                    filename = f"query_results_{args.query}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                    df.to_csv(filename, index=False)
-                    print(f"Results saved to {filename}")
-                else:
-                    print(df.to_string(index=False))
-                
-                print(f"\nTotal records: {len(df)}")
+            run_dataframe_query(partial(query_manager.get_monthly_summary, limit), args.query, args.output)
             
         elif args.query == 'large':
-            df = query_manager.get_large_transactions(args.threshold, args.limit or 50)
             print(f"\n💰 LARGE TRANSACTIONS (>= {args.threshold} SEK)")
             print("=" * 60)
-            
-            # Output results for dataframe queries
-            if df.empty:
-                print("No results found.")
-            else:
-                if args.output == 'csv':
-                    filename = f"query_results_{args.query}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                    df.to_csv(filename, index=False)
-                    print(f"Results saved to {filename}")
-                else:
-                    print(df.to_string(index=False))
-                
-                print(f"\nTotal records: {len(df)}")
+            run_dataframe_query(
+                partial(query_manager.get_large_transactions, args.threshold, args.limit or 50),
+                args.query, args.output
+            )
             
         elif args.query == 'files':
             limit = args.limit or 20
-            df = query_manager.get_file_processing_status(limit)
             print(f"\n📁 FILE PROCESSING STATUS")
             print("=" * 60)
-            
-            # Output results for dataframe queries
-            if df.empty:
-                print("No results found.")
-            else:
-                if args.output == 'csv':
-                    filename = f"query_results_{args.query}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                    df.to_csv(filename, index=False)
-                    print(f"Results saved to {filename}")
-                else:
-                    print(df.to_string(index=False))
-                
-                print(f"\nTotal records: {len(df)}")
+            run_dataframe_query(partial(query_manager.get_file_processing_status, limit), args.query, args.output)
             
         elif args.query == 'search':
             if not args.search:
                 print("❌ --search parameter required for search query")
                 sys.exit(1)
-            df = query_manager.search_transactions(args.search, args.limit or 50)
             print(f"\n🔍 TRANSACTIONS MATCHING '{args.search}'")
             print("=" * 60)
-            
-            # Output results for dataframe queries
-            if df.empty:
-                print("No results found.")
-            else:
-                if args.output == 'csv':
-                    filename = f"query_results_{args.query}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                    df.to_csv(filename, index=False)
-                    print(f"Results saved to {filename}")
-                else:
-                    print(df.to_string(index=False))
-                
-                print(f"\nTotal records: {len(df)}")
+            run_dataframe_query(
+                partial(query_manager.search_transactions, args.search, args.limit or 50),
+                args.query, args.output
+            )
     
     except Exception as e:
         print(f"❌ Query failed: {e}")
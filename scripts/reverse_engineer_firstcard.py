@@ -10,9 +10,12 @@ import logging
 import sys
 import hashlib
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import List, Dict, Optional
 
+import pandas as pd
+
 # Add project root to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -27,6 +30,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Column layout of the Transactions sheet (A:G)
+SHEET_COLUMNS = ['date', 'outflow', 'inflow', 'category', 'account', 'memo', 'status']
+SHEET_COLUMN_LETTERS = "ABCDEFG"
+FIRSTCARD_ACCOUNT = "💳 First Card"
+
+# "1 234,50" -> "1234.50" in a single pass
+AMOUNT_TRANSLATION = str.maketrans({" ": None, ",": "."})
+
+# MD5 state with the constant "firstcard|" key prefix already absorbed;
+# copied per business key so only the variable suffix is hashed
+BUSINESS_KEY_HASHER = hashlib.md5(b"firstcard|")
+
+# firstcard_transactions_raw columns and their query parameter types
+RAW_COLUMN_TYPES = (
+    ('file_hash', 'STRING'),
+    ('source_file', 'STRING'),
+    ('upload_timestamp', 'TIMESTAMP'),
+    ('row_number', 'INT64'),
+    ('datum', 'STRING'),
+    ('ytterligare_information', 'STRING'),
+    ('reseinformation_inkopsplats', 'STRING'),
+    ('valuta', 'STRING'),
+    ('vaxlingskurs', 'FLOAT64'),
+    ('utlandskt_belopp', 'FLOAT64'),
+    ('belopp', 'FLOAT64'),
+    ('moms', 'FLOAT64'),
+    ('kort', 'STRING'),
+    ('business_key', 'STRING'),
+)
+
 
 class FirstCardReverseEngineer:
     """Reverse engineer FirstCard data from Google Sheet to raw format."""
@@ -57,200 +90,204 @@ class FirstCardReverseEngineer:
             logger.error(f"Failed to get existing date range: {e}")
             return None, None, 0
     
-    def read_google_sheet_transactions(self) -> List[List]:
-        """Read transactions from Google Sheet Transactions tab."""
+    def read_google_sheet_transactions(self) -> pd.DataFrame:
+        """
+        Read transactions from Google Sheet Transactions tab.
+        
+        Returns:
+            DataFrame with SHEET_COLUMNS, indexed by sheet row number
+        """
         try:
-            # Read the entire Transactions sheet
+            # Read the entire Transactions sheet as one range per column, with
+            # amounts as raw numbers and dates as displayed
             spreadsheet_id = self.config.spreadsheet_id
-            range_name = f"{self.config.transactions_sheet}!A:G"  # Assuming columns A-G
+            ranges = [
+                f"{self.config.transactions_sheet}!{column}:{column}"
+                for column in SHEET_COLUMN_LETTERS
+            ]
             
-            result = self.sheets_api.service.spreadsheets().values().get(
+            result = self.sheets_api.service.spreadsheets().values().batchGet(
                 spreadsheetId=spreadsheet_id,
-                range=range_name
+                ranges=ranges,
+                majorDimension="COLUMNS",
+                valueRenderOption="UNFORMATTED_VALUE",
+                dateTimeRenderOption="FORMATTED_STRING"
             ).execute()
             
-            values = result.get('values', [])
-            if not values:
+            # A completely empty column comes back without 'values'
+            columns = [
+                value_range.get('values', [[]])[0]
+                for value_range in result.get('valueRanges', [])
+            ]
+            if not any(columns):
                 logger.warning("No data found in Transactions sheet")
-                return []
+                return pd.DataFrame(columns=SHEET_COLUMNS)
             
-            # Skip header row
-            return values[1:] if len(values) > 1 else []
+            # Skip header row; columns are trimmed of trailing empty cells, so
+            # the shorter ones get padded with NaN when aligned on the index
+            df = pd.DataFrame({
+                name: pd.Series(column[1:], dtype=object)
+                for name, column in zip(SHEET_COLUMNS, columns)
+            }).reindex(columns=SHEET_COLUMNS)
+            # Sheet row number (header is row 1)
+            df.index = df.index + 2
+            return df
             
         except Exception as e:
             logger.error(f"Failed to read Google Sheet: {e}")
-            return []
+            return pd.DataFrame(columns=SHEET_COLUMNS)
     
-    def filter_firstcard_transactions(self, sheet_data: List[List], 
+    def filter_firstcard_transactions(self, sheet_data: pd.DataFrame, 
                                     cutoff_date: str = "2023-05-01") -> List[Dict]:
         """
         Filter and convert FirstCard transactions from sheet data.
         
         Args:
-            sheet_data: Raw sheet data
+            sheet_data: Sheet data as returned by read_google_sheet_transactions
             cutoff_date: Only process transactions before this date
         """
-        firstcard_transactions = []
+        if sheet_data.empty:
+            return []
         
-        for i, row in enumerate(sheet_data):
-            try:
-                # Ensure row has enough columns (pad with empty strings if needed)
-                while len(row) < 7:
-                    row.append("")
-                
-                date, outflow, inflow, category, account, memo, status = row[:7]
-                
-                # Filter for FirstCard only
-                if account != "💳 First Card":
-                    continue
-                
-                # Filter by date (only before cutoff_date)
-                if date and date >= cutoff_date:
-                    continue
-                
-                # Skip if no date
-                if not date:
-                    continue
-                
-                # Convert amounts
-                belopp = 0.0
-                if outflow and outflow.strip():
-                    # Outflow -> positive belopp
-                    amount_str = outflow.replace(" ", "").replace(",", ".")
-                    try:
-                        belopp = float(amount_str)
-                    except ValueError:
-                        logger.warning(f"Could not parse outflow: {outflow}")
-                        continue
-                elif inflow and inflow.strip():
-                    # Inflow -> negative belopp
-                    amount_str = inflow.replace(" ", "").replace(",", ".")
-                    try:
-                        belopp = -float(amount_str)  # Negative for inflow
-                    except ValueError:
-                        logger.warning(f"Could not parse inflow: {inflow}")
-                        continue
-                else:
-                    logger.warning(f"No amount found for row {i+2}")
-                    continue
-                
-                # Combine category and memo
-                reseinformation = f"{category} - {memo}".strip(" -")
-                if not reseinformation:
-                    reseinformation = "Historical Transaction"
-                
-                # Create business key
-                business_key = self.create_business_key(date, belopp, reseinformation)
-                
-                # Create raw transaction record
-                raw_transaction = {
-                    'file_hash': 'google_sheet_reverse_engineered',
-                    'source_file': 'orig_google_sheet_rev_engineered',
-                    'upload_timestamp': datetime.now(timezone.utc).isoformat(),
-                    'row_number': i + 2,  # Sheet row number
-                    'datum': date,
-                    'ytterligare_information': memo or "",
-                    'reseinformation_inkopsplats': reseinformation,
-                    'valuta': 'SEK',
-                    'vaxlingskurs': None,
-                    'utlandskt_belopp': None,
-                    'belopp': belopp,
-                    'moms': None,
-                    'kort': 'unknown',
-                    'business_key': business_key
-                }
-                
-                firstcard_transactions.append(raw_transaction)
-                
-            except Exception as e:
-                logger.error(f"Error processing row {i+2}: {e}")
-                continue
+        # Numeric cells arrive as int/float; compare and parse everything as text
+        df = sheet_data.fillna("").astype(str)
         
-        return firstcard_transactions
-    
-    def create_business_key(self, date: str, belopp: float, description: str) -> str:
-        """Create unique business key for reverse engineered transaction."""
-        # Normalize components
-        date_str = str(date)[:10] if date else "unknown"
-        amount_str = f"{belopp:.2f}"
-        desc_normalized = description.strip().lower()[:50] if description else ""
+        # Filter for FirstCard rows with a date before cutoff_date
+        df = df[(df['account'] == FIRSTCARD_ACCOUNT) & (df['date'] != "") & (df['date'] < cutoff_date)]
+        if df.empty:
+            return []
+        
+        # Convert amounts: outflow -> positive belopp, inflow -> negative belopp
+        has_outflow = df['outflow'].str.strip() != ""
+        has_inflow = ~has_outflow & (df['inflow'].str.strip() != "")
+        outflow = pd.to_numeric(df['outflow'].str.translate(AMOUNT_TRANSLATION), errors='coerce')
+        inflow = pd.to_numeric(df['inflow'].str.translate(AMOUNT_TRANSLATION), errors='coerce')
+        belopp = outflow.where(has_outflow, -inflow)
+        
+        for row_number in df.index[has_outflow & outflow.isna()]:
+            logger.warning(f"Could not parse outflow: {df.at[row_number, 'outflow']}")
+        for row_number in df.index[has_inflow & inflow.isna()]:
+            logger.warning(f"Could not parse inflow: {df.at[row_number, 'inflow']}")
+        for row_number in df.index[~has_outflow & ~has_inflow]:
+            logger.warning(f"No amount found for row {row_number}")
+        
+        valid = (has_outflow | has_inflow) & belopp.notna()
+        df = df[valid]
+        belopp = belopp[valid].astype(float)
+        
+        # Combine category and memo
+        reseinformation = (df['category'] + " - " + df['memo']).str.strip(" -")
+        reseinformation = reseinformation.where(reseinformation != "", "Historical Transaction")
+        
+        business_keys = self.create_business_keys(df['date'], belopp, reseinformation)
         
-        # Create business key
-        key_components = f"firstcard|{date_str}|{amount_str}|{desc_normalized}"
-        business_key = hashlib.md5(key_components.encode('utf-8')).hexdigest()
+        # Create raw transaction records
+        records = pd.DataFrame({
+            'file_hash': 'google_sheet_reverse_engineered',
+            'source_file': 'orig_google_sheet_rev_engineered',
+            'upload_timestamp': datetime.now(timezone.utc).isoformat(),
+            'row_number': df.index,
+            'datum': df['date'],
+            'ytterligare_information': df['memo'],
+            'reseinformation_inkopsplats': reseinformation,
+            'valuta': 'SEK',
+            'vaxlingskurs': None,
+            'utlandskt_belopp': None,
+            'belopp': belopp,
+            'moms': None,
+            'kort': 'unknown',
+            'business_key': business_keys
+        }, index=df.index)
         
-        return f"firstcard_rev_{business_key}"
+        return records.astype(object).where(records.notna(), None).to_dict('records')
     
-    def check_for_duplicates(self, transactions: List[Dict]) -> List[Dict]:
-        """Check for existing business keys to avoid duplicates."""
-        if not transactions:
-            return []
+    def create_business_keys(self, dates: pd.Series, beloppar: pd.Series,
+                             descriptions: pd.Series) -> List[str]:
+        """
+        Create unique business keys for reverse engineered transactions.
         
-        business_keys = [t['business_key'] for t in transactions]
+        Works on whole columns of non-empty dates; each key is
+        md5("firstcard|{date}|{amount}|{description}").
+        """
+        key_components = (
+            dates.str[:10]
+            + "|" + beloppar.map("{:.2f}".format)
+            + "|" + descriptions.str.strip().str.lower().str[:50]
+        )
+        business_keys = []
+        for components in key_components:
+            hasher = BUSINESS_KEY_HASHER.copy()
+            hasher.update(components.encode('utf-8'))
+            business_keys.append(f"firstcard_rev_{hasher.hexdigest()}")
+        return business_keys
+    
+    def _backup_statement(self) -> tuple:
+        """Build the CREATE TABLE AS SELECT statement that backs up the raw table."""
+        backup_table = f"firstcard_transactions_raw_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        # Check existing keys
-        placeholders = ', '.join([f"'{key}'" for key in business_keys])
         query = f"""
-        SELECT DISTINCT business_key
-        FROM `{self.config.gcp_project_id}.{self.dataset_id}.firstcard_transactions_raw`
-        WHERE business_key IN ({placeholders})
+        CREATE TABLE `{self.config.gcp_project_id}.{self.dataset_id}.{backup_table}` AS
+        SELECT * FROM `{self.config.gcp_project_id}.{self.dataset_id}.firstcard_transactions_raw`;
         """
-        
-        try:
-            result = self.client.query(query).result()
-            existing_keys = set(row.business_key for row in result)
-            
-            # Filter out duplicates
-            new_transactions = [t for t in transactions if t['business_key'] not in existing_keys]
-            
-            duplicate_count = len(transactions) - len(new_transactions)
-            if duplicate_count > 0:
-                logger.info(f"Skipping {duplicate_count} duplicate transactions")
-            
-            return new_transactions
-            
-        except Exception as e:
-            logger.warning(f"Could not check for duplicates: {e}")
-            return transactions
+        return backup_table, query
     
-    def insert_raw_transactions(self, transactions: List[Dict]) -> int:
-        """Insert transactions into firstcard_transactions_raw table."""
+    def merge_raw_transactions(self, transactions: List[Dict], create_backup: bool = False) -> int:
+        """
+        Insert transactions whose business_key is not already in the raw table.
+        
+        The optional backup and the MERGE run as one BigQuery script, so the
+        duplicate check and the insert happen in a single atomic statement.
+        
+        Returns:
+            Number of transactions inserted
+        """
         if not transactions:
             logger.info("No transactions to insert")
             return 0
         
-        table_ref = self.client.dataset(self.dataset_id).table('firstcard_transactions_raw')
+        script = ""
+        if create_backup:
+            backup_table, script = self._backup_statement()
         
-        try:
-            errors = self.client.insert_rows_json(table_ref, transactions)
-            if errors:
-                logger.error(f"Failed to insert rows: {errors}")
-                return 0
-            
-            logger.info(f"✅ Successfully inserted {len(transactions)} reverse engineered transactions")
-            return len(transactions)
-            
-        except Exception as e:
-            logger.error(f"Failed to insert transactions: {e}")
-            raise
-    
-    def create_backup(self) -> bool:
-        """Create backup of existing firstcard_transactions_raw table."""
-        backup_table = f"firstcard_transactions_raw_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        query = f"""
-        CREATE TABLE `{self.config.gcp_project_id}.{self.dataset_id}.{backup_table}` AS
-        SELECT * FROM `{self.config.gcp_project_id}.{self.dataset_id}.firstcard_transactions_raw`
+        column_list = ", ".join(name for name, _ in RAW_COLUMN_TYPES)
+        source_list = ", ".join(f"source.{name}" for name, _ in RAW_COLUMN_TYPES)
+        script += f"""
+        MERGE `{self.config.gcp_project_id}.{self.dataset_id}.firstcard_transactions_raw` AS target
+        USING (SELECT * FROM UNNEST(@rows)) AS source
+        ON target.business_key = source.business_key
+        WHEN NOT MATCHED THEN
+            INSERT ({column_list})
+            VALUES ({source_list});
         """
         
-        try:
-            job = self.client.query(query)
-            job.result()  # Wait for completion
+        rows = [
+            bigquery.StructQueryParameter(
+                None,
+                *(bigquery.ScalarQueryParameter(name, type_, transaction[name])
+                  for name, type_ in RAW_COLUMN_TYPES)
+            )
+            for transaction in transactions
+        ]
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ArrayQueryParameter("rows", "STRUCT", rows)
+        ])
+        
+        job = self.client.query(script, job_config=job_config)
+        job.result()
+        if create_backup:
             logger.info(f"✅ Created backup table: {backup_table}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to create backup: {e}")
-            return False
+        
+        inserted_count = sum(
+            child.num_dml_affected_rows or 0
+            for child in self.client.list_jobs(parent_job=job.job_id)
+            if child.statement_type == "MERGE"
+        )
+        duplicate_count = len(transactions) - inserted_count
+        if duplicate_count > 0:
+            logger.info(f"Skipping {duplicate_count} duplicate transactions")
+        
+        logger.info(f"✅ Successfully inserted {inserted_count} reverse engineered transactions")
+        return inserted_count
     
     def reverse_engineer_firstcard_data(self, cutoff_date: str = "2023-05-01", 
                                       create_backup: bool = True) -> int:
@@ -266,49 +303,52 @@ class FirstCardReverseEngineer:
         """
         logger.info("🚀 Starting FirstCard reverse engineering process")
         
-        # Step 1: Check existing data
-        min_date, max_date, count = self.get_existing_firstcard_date_range()
-        logger.info(f"📊 Existing FirstCard raw data: {count} transactions")
-        if min_date and max_date:
-            logger.info(f"   Date range: {min_date} to {max_date}")
-        
-        # Step 2: Create backup if requested
-        if create_backup and count > 0:
-            if not self.create_backup():
-                logger.error("❌ Backup failed, aborting")
+        # The date-range lookup is independent of the sheet read, so it runs on a
+        # worker thread while the main thread reads and filters the sheet
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            # Step 1: Check existing data (in the background)
+            date_range_future = executor.submit(self.get_existing_firstcard_date_range)
+            
+            # Step 2: Read Google Sheet
+            logger.info("📖 Reading Google Sheet Transactions...")
+            sheet_data = self.read_google_sheet_transactions()
+            if sheet_data.empty:
+                logger.error("❌ No data found in Google Sheet")
                 return 0
+            
+            logger.info(f"📋 Found {len(sheet_data)} total rows in sheet")
+            
+            # Step 3: Filter and convert FirstCard transactions
+            logger.info(f"🔍 Filtering FirstCard transactions before {cutoff_date}...")
+            firstcard_transactions = self.filter_firstcard_transactions(sheet_data, cutoff_date)
+            
+            if not firstcard_transactions:
+                logger.info("ℹ️  No FirstCard transactions found to reverse engineer")
+                return 0
+            
+            logger.info(f"🎯 Found {len(firstcard_transactions)} FirstCard transactions to reverse engineer")
+            
+            min_date, max_date, count = date_range_future.result()
+            logger.info(f"📊 Existing FirstCard raw data: {count} transactions")
+            if min_date and max_date:
+                logger.info(f"   Date range: {min_date} to {max_date}")
         
-        # Step 3: Read Google Sheet
-        logger.info("📖 Reading Google Sheet Transactions...")
-        sheet_data = self.read_google_sheet_transactions()
-        if not sheet_data:
-            logger.error("❌ No data found in Google Sheet")
-            return 0
-        
-        logger.info(f"📋 Found {len(sheet_data)} total rows in sheet")
-        
-        # Step 4: Filter and convert FirstCard transactions
-        logger.info(f"🔍 Filtering FirstCard transactions before {cutoff_date}...")
-        firstcard_transactions = self.filter_firstcard_transactions(sheet_data, cutoff_date)
-        
-        if not firstcard_transactions:
-            logger.info("ℹ️  No FirstCard transactions found to reverse engineer")
+        # Step 4: Back up (if requested) and insert new transactions, skipping
+        # business keys that already exist, in a single BigQuery script
+        logger.info(f"📥 Merging {len(firstcard_transactions)} transactions...")
+        try:
+            inserted_count = self.merge_raw_transactions(
+                firstcard_transactions,
+                create_backup=create_backup and count > 0
+            )
+        except Exception as e:
+            logger.error(f"❌ Backup/insert failed, aborting: {e}")
             return 0
         
-        logger.info(f"🎯 Found {len(firstcard_transactions)} FirstCard transactions to reverse engineer")
-        
-        # Step 5: Check for duplicates
-        logger.info("🔍 Checking for duplicates...")
-        new_transactions = self.check_for_duplicates(firstcard_transactions)
-        
-        if not new_transactions:
-            logger.info("ℹ️  All transactions already exist, nothing to insert")
+        if not inserted_count:
+            logger.info("ℹ️  All transactions already exist, nothing inserted")
             return 0
         
-        # Step 6: Insert new transactions
-        logger.info(f"📥 Inserting {len(new_transactions)} new transactions...")
-        inserted_count = self.insert_raw_transactions(new_transactions)
-        
         logger.info(f"🎉 Reverse engineering complete! Inserted {inserted_count} transactions")
         return inserted_count
 
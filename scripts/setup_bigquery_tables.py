@@ -3,17 +3,35 @@
 BigQuery table setup script for Budget Updater.
 
 This script creates the necessary BigQuery tables to store raw transaction data
-from multiple bank sources (SEB, Revolut, FirstCard, Strawberry).
+from multiple bank sources (SEB, Revolut, FirstCard, Strawberry): one narrow
+raw_<bank> table per bank plus a raw_transactions_unified view over their
+standardized columns.
+
+The raw tables are partitioned on the integer year_month bucket (e.g. 202401)
+and require a partition filter, so every query against them (or the unified
+view) must constrain it, e.g. WHERE year_month BETWEEN 202401 AND 202412.
+
+Per-file metadata (filename, upload time) is stored once in file_processing_log
+rather than on every transaction row; reporting queries that need it should
+JOIN file_processing_log USING (file_hash).
 
 Usage:
-    python scripts/setup_bigquery_tables.py
+    python scripts/setup_bigquery_tables.py [--with-descriptions]
 """
 
+import argparse
+import functools
 import os
 import sys
 from pathlib import Path
+from typing import List, Sequence, Tuple
+import google.auth
+import requests
+from google.api_core import retry
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import bigquery
-from google.cloud.exceptions import NotFound, Conflict
+from google.cloud.bigquery_storage_v1 import BigQueryWriteClient, types, writer
+from google.protobuf import descriptor_pb2
 import logging
 
 # Add src to path for imports
@@ -23,205 +41,336 @@ from budget_updater.config import Config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_raw_transactions_table(client: bigquery.Client, dataset_id: str, table_id: str = "raw_transactions"):
+# Retry transient (429/5xx) API errors during setup with exponential backoff
+CREATE_RETRY = retry.Retry(predicate=retry.if_transient_error, initial=1.0,
+                           maximum=10.0, multiplier=2.0, deadline=60.0)
+CREATE_TIMEOUT = 30
+
+# Retry streaming inserts on transient (429/5xx) errors
+INSERT_RETRY = retry.Retry(predicate=retry.if_transient_error, deadline=60.0)
+INSERT_BATCH_SIZE = 500
+
+BIGQUERY_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+HTTP_POOL_MAXSIZE = 20
+
+# SchemaField types that are spelled differently in DDL
+_DDL_TYPES = {"INTEGER": "INT64", "FLOAT": "FLOAT64", "BOOLEAN": "BOOL"}
+
+def create_client(project_id: str, pool_maxsize: int = HTTP_POOL_MAXSIZE) -> bigquery.Client:
+    """
+    Create a BigQuery client whose HTTP session keeps enough pooled connections
+    for concurrent operations instead of funnelling them through the default
+    pool of 10.
+    """
+    credentials, _ = google.auth.default(scopes=BIGQUERY_SCOPES)
+    session = AuthorizedSession(credentials)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    return bigquery.Client(project=project_id, credentials=credentials, _http=session)
+
+# Columns shared by every per-bank raw table as (name, type, mode[, precision, scale])
+_RAW_TRANSACTIONS_FIELDS = (
+    # === METADATA COLUMNS ===
+    ("transaction_id", "INTEGER", "REQUIRED"),
+    ("transaction_id_hi", "INTEGER", "NULLABLE"),
+    ("source_bank", "STRING", "NULLABLE"),
+    ("file_hash", "STRING", "NULLABLE"),
+    
+    # === STANDARDIZED COLUMNS (parsed by our parsers) ===
+    ("parsed_date", "DATE", "NULLABLE"),
+    ("year_month", "INTEGER", "NULLABLE"),
+    ("parsed_description", "STRING", "NULLABLE"),
+    ("parsed_amount", "NUMERIC", "NULLABLE", 18, 4),
+    
+    # === RAW COLUMNS (bank-native fields) ===
+    ("raw_payload", "JSON", "NULLABLE"),
+)
+
+_RAW_TRANSACTIONS_DOCS = {
+    "transaction_id": "Unique identifier (first 64 bits of BLAKE2b-128 of source + raw data)",
+    "transaction_id_hi": "Next 64 bits of the same hash, secondary dedup key",
+    "source_bank": "Bank/card source: seb, revolut, firstcard, strawberry",
+    "file_hash": "Hash of source file; join file_processing_log for filename and upload time",
+    "parsed_date": "Standardized transaction date",
+    "year_month": "Partition bucket of parsed_date as year*100+month, set by the uploader",
+    "parsed_description": "Standardized description/text",
+    "parsed_amount": "Standardized amount (negative=outflow, positive=inflow)",
+    "raw_payload": "Bank-native fields as JSON",
+}
+
+_FILE_PROCESSING_LOG_FIELDS = (
+    ("file_hash", "STRING", "NULLABLE"),
+    ("filename", "STRING", "NULLABLE"),
+    ("source_bank", "STRING", "NULLABLE"),
+    ("file_size_bytes", "INTEGER", "NULLABLE"),
+    ("processed_timestamp", "TIMESTAMP", "NULLABLE"),
+    ("records_processed", "INTEGER", "NULLABLE"),
+    ("processing_status", "STRING", "NULLABLE"),
+    ("error_message", "STRING", "NULLABLE"),
+)
+
+_FILE_PROCESSING_LOG_DOCS = {
+    "file_hash": "SHA256 hash of the file content",
+    "filename": "Original filename",
+    "source_bank": "Bank source identifier",
+    "file_size_bytes": "File size in bytes",
+    "processed_timestamp": "When the file was processed",
+    "records_processed": "Number of records loaded from this file",
+    "processing_status": "SUCCESS, FAILED, or PARTIAL",
+    "error_message": "Error details if processing failed",
+}
+
+def _build_schema(fields: Sequence[tuple], docs: dict = None) -> Tuple[bigquery.SchemaField, ...]:
+    """Build SchemaFields from field tuples, with column descriptions only if docs is given."""
+    schema = []
+    for name, field_type, mode, *numeric in fields:
+        precision, scale = numeric or (None, None)
+        schema.append(bigquery.SchemaField(
+            name, field_type, mode=mode, precision=precision, scale=scale,
+            description=docs[name] if docs else None,
+        ))
+    return tuple(schema)
+
+@functools.lru_cache(maxsize=None)
+def raw_transactions_schema(with_descriptions: bool = False) -> Tuple[bigquery.SchemaField, ...]:
+    """Schema of the per-bank raw tables, built on first use."""
+    return _build_schema(_RAW_TRANSACTIONS_FIELDS, _RAW_TRANSACTIONS_DOCS if with_descriptions else None)
+
+@functools.lru_cache(maxsize=None)
+def file_processing_log_schema(with_descriptions: bool = False) -> Tuple[bigquery.SchemaField, ...]:
+    """Schema of the file processing log, built on first use."""
+    return _build_schema(_FILE_PROCESSING_LOG_FIELDS, _FILE_PROCESSING_LOG_DOCS if with_descriptions else None)
+
+# Banks with their own raw table. Bank-native columns live in the raw_payload
+# JSON column, keyed by the uploader's column names (e.g. seb_belopp,
+# revolut_started_date), and are read with JSON_VALUE(raw_payload, '$.seb_belopp').
+# The uploader pre-parses raw dates to ISO strings and writes amounts as exact
+# decimals, so CAST(JSON_VALUE(...) AS DATE / NUMERIC) recovers the typed value.
+RAW_BANKS = ("seb", "revolut", "firstcard", "strawberry")
+
+def _sql_string(value: str) -> str:
+    """Quote a Python string as a BigQuery string literal."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _columns_ddl(schema: Sequence[bigquery.SchemaField]) -> str:
+    """Render a schema as the column list of a CREATE TABLE statement."""
+    columns = []
+    for field in schema:
+        column = f"{field.name} {_DDL_TYPES.get(field.field_type, field.field_type)}"
+        if field.precision is not None:
+            column += f"({field.precision}, {field.scale or 0})"
+        if field.mode == "REQUIRED":
+            column += " NOT NULL"
+        if field.description:
+            column += f" OPTIONS(description={_sql_string(field.description)})"
+        columns.append(column)
+    return ",\n            ".join(columns)
+
+# Integer-range partitions for year_month: one bucket per value from 2020-01 up to 2100
+YEAR_MONTH_RANGE = (202001, 210001, 1)
+
+def _labels_ddl(labels: dict) -> str:
+    """Render table labels as a DDL OPTIONS value."""
+    return "[" + ", ".join(f"({_sql_string(k)}, {_sql_string(v)})" for k, v in labels.items()) + "]"
+
+def raw_transactions_table_ddl(project_id: str, dataset_id: str, source_bank: str,
+                               table_id: str = None, with_descriptions: bool = False) -> str:
     """
-    Create the main raw transactions table with flexible schema to handle all bank formats.
+    Build the CREATE TABLE statement for a single bank's raw transactions table.
     
     Table design:
-    - Unified schema that can handle all bank formats
-    - Raw columns preserved for full fidelity  
+    - One narrow table per bank (raw_seb, raw_revolut, raw_firstcard, raw_strawberry)
+    - Raw columns preserved for full fidelity in a single JSON column
     - Standardized columns for common analysis
-    - Metadata columns for tracking and deduplication
-    """
-    
-    table_ref = client.dataset(dataset_id).table(table_id)
-    
-    # Define schema - mix of standardized and flexible columns
-    schema = [
-        # === METADATA COLUMNS ===
-        bigquery.SchemaField("transaction_id", "STRING", mode="REQUIRED", 
-                            description="Unique identifier (hash of source + raw data)"),
-        bigquery.SchemaField("source_bank", "STRING", mode="REQUIRED", 
-                            description="Bank/card source: seb, revolut, firstcard, strawberry"),
-        bigquery.SchemaField("source_file", "STRING", mode="NULLABLE", 
-                            description="Original filename"),
-        bigquery.SchemaField("upload_timestamp", "TIMESTAMP", mode="REQUIRED", 
-                            description="When this record was uploaded to BigQuery"),
-        bigquery.SchemaField("file_hash", "STRING", mode="NULLABLE", 
-                            description="Hash of source file for deduplication"),
-        
-        # === STANDARDIZED COLUMNS (parsed by our parsers) ===
-        bigquery.SchemaField("parsed_date", "DATE", mode="REQUIRED", 
-                            description="Standardized transaction date"),
-        bigquery.SchemaField("parsed_description", "STRING", mode="REQUIRED", 
-                            description="Standardized description/text"),
-        bigquery.SchemaField("parsed_amount", "FLOAT64", mode="REQUIRED", 
-                            description="Standardized amount (negative=outflow, positive=inflow)"),
-        
-        # === RAW COLUMNS - SEB FORMAT ===
-        bigquery.SchemaField("seb_bokforingsdatum", "STRING", mode="NULLABLE", 
-                            description="SEB: Bokföringsdatum (raw)"),
-        bigquery.SchemaField("seb_valutadatum", "STRING", mode="NULLABLE", 
-                            description="SEB: Valutadatum (raw)"),
-        bigquery.SchemaField("seb_verifikationsnummer", "INTEGER", mode="NULLABLE", 
-                            description="SEB: Verifikationsnummer"),
-        bigquery.SchemaField("seb_text", "STRING", mode="NULLABLE", 
-                            description="SEB: Text (raw)"),
-        bigquery.SchemaField("seb_belopp", "FLOAT64", mode="NULLABLE", 
-                            description="SEB: Belopp (raw)"),
-        bigquery.SchemaField("seb_saldo", "FLOAT64", mode="NULLABLE", 
-                            description="SEB: Saldo"),
-        
-        # === RAW COLUMNS - REVOLUT FORMAT ===
-        bigquery.SchemaField("revolut_type", "STRING", mode="NULLABLE", 
-                            description="Revolut: Type"),
-        bigquery.SchemaField("revolut_product", "STRING", mode="NULLABLE", 
-                            description="Revolut: Product"),
-        bigquery.SchemaField("revolut_started_date", "STRING", mode="NULLABLE", 
-                            description="Revolut: Started Date (raw)"),
-        bigquery.SchemaField("revolut_completed_date", "STRING", mode="NULLABLE", 
-                            description="Revolut: Completed Date (raw)"),
-        bigquery.SchemaField("revolut_description", "STRING", mode="NULLABLE", 
-                            description="Revolut: Description (raw)"),
-        bigquery.SchemaField("revolut_amount", "FLOAT64", mode="NULLABLE", 
-                            description="Revolut: Amount (raw)"),
-        bigquery.SchemaField("revolut_fee", "FLOAT64", mode="NULLABLE", 
-                            description="Revolut: Fee"),
-        bigquery.SchemaField("revolut_currency", "STRING", mode="NULLABLE", 
-                            description="Revolut: Currency"),
-        bigquery.SchemaField("revolut_state", "STRING", mode="NULLABLE", 
-                            description="Revolut: State"),
-        bigquery.SchemaField("revolut_balance", "FLOAT64", mode="NULLABLE", 
-                            description="Revolut: Balance"),
-        
-        # === RAW COLUMNS - FIRSTCARD FORMAT ===
-        bigquery.SchemaField("firstcard_datum", "STRING", mode="NULLABLE", 
-                            description="FirstCard: Datum (raw)"),
-        bigquery.SchemaField("firstcard_ytterligare_info", "STRING", mode="NULLABLE", 
-                            description="FirstCard: Ytterligare information"),
-        bigquery.SchemaField("firstcard_reseinformation", "STRING", mode="NULLABLE", 
-                            description="FirstCard: Reseinformation / Inköpsplats (raw)"),
-        bigquery.SchemaField("firstcard_valuta", "STRING", mode="NULLABLE", 
-                            description="FirstCard: Valuta"),
-        bigquery.SchemaField("firstcard_vaxlingskurs", "FLOAT64", mode="NULLABLE", 
-                            description="FirstCard: Växlingskurs"),
-        bigquery.SchemaField("firstcard_utlandskt_belopp", "FLOAT64", mode="NULLABLE", 
-                            description="FirstCard: Utländskt belopp"),
-        bigquery.SchemaField("firstcard_belopp", "FLOAT64", mode="NULLABLE", 
-                            description="FirstCard: Belopp (raw)"),
-        bigquery.SchemaField("firstcard_moms", "FLOAT64", mode="NULLABLE", 
-                            description="FirstCard: Moms"),
-        bigquery.SchemaField("firstcard_kort", "STRING", mode="NULLABLE", 
-                            description="FirstCard: Kort"),
-        
-        # === RAW COLUMNS - STRAWBERRY FORMAT ===
-        bigquery.SchemaField("strawberry_datum", "STRING", mode="NULLABLE", 
-                            description="Strawberry: Datum (raw)"),
-        bigquery.SchemaField("strawberry_bokfort", "STRING", mode="NULLABLE", 
-                            description="Strawberry: Bokfört (raw)"),
-        bigquery.SchemaField("strawberry_specifikation", "STRING", mode="NULLABLE", 
-                            description="Strawberry: Specifikation (raw)"),
-        bigquery.SchemaField("strawberry_ort", "STRING", mode="NULLABLE", 
-                            description="Strawberry: Ort"),
-        bigquery.SchemaField("strawberry_valuta", "STRING", mode="NULLABLE", 
-                            description="Strawberry: Valuta"),
-        bigquery.SchemaField("strawberry_utl_belopp_moms", "STRING", mode="NULLABLE", 
-                            description="Strawberry: Utl.belopp/moms"),
-        bigquery.SchemaField("strawberry_belopp", "FLOAT64", mode="NULLABLE", 
-                            description="Strawberry: Belopp (raw)"),
-    ]
+    - file_hash as the only per-file metadata column; the rest lives in
+      file_processing_log
+    - Monthly integer-range partitions on year_month: household-scale volumes
+      leave daily partitions near-empty, and monthly rollups hit whole buckets.
+      BigQuery has no generated columns, so the uploader fills year_month
+    - A partition filter is required so no query scans every partition
+    - source_bank is constant within a per-bank table, so clustering leads
+      with file_hash for the file_processing_log join, then the columns
+      typical amount/merchant filters prune on
+    - Column descriptions only when with_descriptions is set, keeping the
+      table metadata returned by every get_table call small
+    """
     
-    table = bigquery.Table(table_ref, schema=schema)
+    table_id = table_id or f"raw_{source_bank}"
+    start, end, interval = YEAR_MONTH_RANGE
+    description = f"Raw {source_bank} transaction data with standardized parsing"
     
-    # Set table options
-    table.description = "Raw transaction data from all bank sources with standardized parsing"
+    return f"""
+        CREATE TABLE IF NOT EXISTS `{project_id}.{dataset_id}.{table_id}` (
+            {_columns_ddl(raw_transactions_schema(with_descriptions))}
+        )
+        PARTITION BY RANGE_BUCKET(year_month, GENERATE_ARRAY({start}, {end}, {interval}))
+        CLUSTER BY file_hash, parsed_amount, parsed_description
+        OPTIONS(
+            require_partition_filter=TRUE,
+            description={_sql_string(description)},
+            labels={_labels_ddl({"tier": "raw", "bank": source_bank})}
+        )
+    """
+
+def raw_transactions_view_ddl(project_id: str, dataset_id: str,
+                              view_id: str = "raw_transactions_unified") -> str:
+    """
+    Build the view that unions the standardized columns of all per-bank raw tables.
+    """
     
-    # Clustering and partitioning for performance
-    table.time_partitioning = bigquery.TimePartitioning(
-        type_=bigquery.TimePartitioningType.DAY,
-        field="parsed_date"
+    columns = ", ".join(field[0] for field in _RAW_TRANSACTIONS_FIELDS if field[0] != "raw_payload")
+    selects = "\n        UNION ALL\n        ".join(
+        f"SELECT {columns} FROM `{project_id}.{dataset_id}.raw_{bank}`"
+        for bank in RAW_BANKS
     )
-    table.clustering_fields = ["source_bank", "upload_timestamp"]
+    return f"""
+        CREATE OR REPLACE VIEW `{project_id}.{dataset_id}.{view_id}` AS
+        {selects}
+    """
+
+def daily_bank_materialized_view_ddl(project_id: str, dataset_id: str, source_bank: str) -> str:
+    """
+    Build the per-day aggregate materialized view over one bank's raw table.
     
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
-
-def create_file_processing_log_table(client: bigquery.Client, dataset_id: str, table_id: str = "file_processing_log"):
-    """
-    Create a log table to track file processing and prevent duplicate uploads.
-    """
-    
-    table_ref = client.dataset(dataset_id).table(table_id)
-    
-    schema = [
-        bigquery.SchemaField("file_hash", "STRING", mode="REQUIRED", 
-                            description="SHA256 hash of the file content"),
-        bigquery.SchemaField("filename", "STRING", mode="REQUIRED", 
-                            description="Original filename"),
-        bigquery.SchemaField("source_bank", "STRING", mode="REQUIRED", 
-                            description="Bank source identifier"),
-        bigquery.SchemaField("file_size_bytes", "INTEGER", mode="NULLABLE", 
-                            description="File size in bytes"),
-        bigquery.SchemaField("processed_timestamp", "TIMESTAMP", mode="REQUIRED", 
-                            description="When the file was processed"),
-        bigquery.SchemaField("records_processed", "INTEGER", mode="NULLABLE", 
-                            description="Number of records loaded from this file"),
-        bigquery.SchemaField("processing_status", "STRING", mode="REQUIRED", 
-                            description="SUCCESS, FAILED, or PARTIAL"),
-        bigquery.SchemaField("error_message", "STRING", mode="NULLABLE", 
-                            description="Error details if processing failed"),
+    BigQuery refreshes it automatically, so dashboards summing amounts per day
+    read the pre-aggregated rows instead of scanning the raw partitions.
+    Materialized views cannot read from the unified view, hence one per bank.
+    """
+    
+    # The open-ended year_month predicate satisfies require_partition_filter on the base table
+    return f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS `{project_id}.{dataset_id}.mv_daily_{source_bank}` AS
+        SELECT
+            parsed_date,
+            source_bank,
+            SUM(parsed_amount) AS total,
+            COUNT(*) AS n
+        FROM `{project_id}.{dataset_id}.raw_{source_bank}`
+        WHERE year_month >= 0
+        GROUP BY parsed_date, source_bank
+    """
+
+def file_processing_log_table_ddl(project_id: str, dataset_id: str,
+                                  table_id: str = "file_processing_log",
+                                  with_descriptions: bool = False) -> str:
+    """
+    Build the log table that tracks file processing and prevents duplicate uploads.
+    
+    Clustered on file_hash first so the uploader's deduplication lookup (only
+    made when its local hash cache misses) is a near-constant-time point lookup.
+    """
+    
+    description = "Log of processed files to prevent duplicates and track processing history"
+    
+    return f"""
+        CREATE TABLE IF NOT EXISTS `{project_id}.{dataset_id}.{table_id}` (
+            {_columns_ddl(file_processing_log_schema(with_descriptions))}
+        )
+        CLUSTER BY file_hash, processing_status, source_bank
+        OPTIONS(
+            description={_sql_string(description)},
+            labels={_labels_ddl({"tier": "log"})}
+        )
+    """
+
+def create_tables(client: bigquery.Client, dataset_id: str, with_descriptions: bool = False):
+    """
+    Create all raw tables, the file processing log and the unified view with a
+    single multi-statement script job instead of one API round-trip per table.
+    """
+    
+    statements = [
+        raw_transactions_table_ddl(client.project, dataset_id, source_bank,
+                                   with_descriptions=with_descriptions)
+        for source_bank in RAW_BANKS
     ]
+    statements.append(file_processing_log_table_ddl(client.project, dataset_id,
+                                                    with_descriptions=with_descriptions))
+    # The views need all raw tables to exist, so they go last
+    statements.append(raw_transactions_view_ddl(client.project, dataset_id))
+    statements.extend(
+        daily_bank_materialized_view_ddl(client.project, dataset_id, source_bank)
+        for source_bank in RAW_BANKS
+    )
+    script = ";\n".join(statements)
     
-    table = bigquery.Table(table_ref, schema=schema)
-    table.description = "Log of processed files to prevent duplicates and track processing history"
+    client.query(script, retry=CREATE_RETRY, timeout=CREATE_TIMEOUT).result(retry=CREATE_RETRY)
+    logger.info(f"✅ Created tables and views in {dataset_id}")
+
+@functools.lru_cache(maxsize=64)
+def _table_ref(table_id: str, project_id: str) -> bigquery.TableReference:
+    """Resolve a "dataset.table" or "project.dataset.table" id once per process."""
+    return bigquery.TableReference.from_string(table_id, default_project=project_id)
+
+def batch_insert(client: bigquery.Client, table_id: str, rows: List[dict],
+                 batch_size: int = INSERT_BATCH_SIZE) -> List[dict]:
+    """
+    Stream rows into a table with one insertAll request per batch_size rows.
     
-    # Cluster by source_bank and processed_timestamp for efficient lookups
-    table.clustering_fields = ["source_bank", "processed_timestamp"]
+    This is the canonical entry point for streaming into the tables created
+    here; higher-volume loaders can append through get_writer() instead.
+    Returns the per-row errors reported by BigQuery, empty on success.
+    """
     
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+    errors = []
+    for start in range(0, len(rows), batch_size):
+        errors.extend(client.insert_rows_json(
+            _table_ref(table_id, client.project),
+            rows[start:start + batch_size],
+            skip_invalid_rows=False,
+            ignore_unknown_values=False,
+            retry=INSERT_RETRY,
+        ))
+    return errors
 
-def setup_bigquery_dataset_and_tables():
+_write_client = None
+
+def get_writer(project_id: str, dataset_id: str, table_id: str,
+               proto_descriptor: descriptor_pb2.DescriptorProto) -> writer.AppendRowsStream:
+    """
+    Open an append stream on a table's default stream via the Storage Write API.
+    
+    All writers share one BigQueryWriteClient, so appends to every bank table
+    are multiplexed over the same gRPC channel instead of each opening its own.
+    Rows are sent as serialized protos matching proto_descriptor.
+    """
+    global _write_client
+    if _write_client is None:
+        _write_client = BigQueryWriteClient()
+    
+    proto_schema = types.ProtoSchema()
+    proto_schema.proto_descriptor = proto_descriptor
+    proto_data = types.AppendRowsRequest.ProtoData()
+    proto_data.writer_schema = proto_schema
+    
+    request_template = types.AppendRowsRequest()
+    request_template.write_stream = f"{_write_client.table_path(project_id, dataset_id, table_id)}/streams/_default"
+    request_template.proto_rows = proto_data
+    return writer.AppendRowsStream(_write_client, request_template)
+
+def setup_bigquery_dataset_and_tables(with_descriptions: bool = False):
     """
     Main function to set up BigQuery dataset and all required tables.
     """
     try:
         # Initialize config and client
         config = Config()
-        client = bigquery.Client(project=config.gcp_project_id)
+        client = create_client(config.gcp_project_id)
         
         dataset_id = config.bigquery_dataset_id
         
         # Create dataset if it doesn't exist
-        dataset_ref = client.dataset(dataset_id)
-        try:
-            dataset = client.get_dataset(dataset_ref)
-            logger.info(f"✅ Dataset {dataset_id} already exists")
-        except NotFound:
-            dataset = bigquery.Dataset(dataset_ref)
-            dataset.location = "EU"  # Change if needed
-            dataset.description = "Budget Updater transaction data storage"
-            dataset = client.create_dataset(dataset, exists_ok=True)
-            logger.info(f"✅ Created dataset {dataset_id}")
+        dataset_ref = bigquery.DatasetReference(config.gcp_project_id, dataset_id)
+        dataset = bigquery.Dataset(dataset_ref)
+        dataset.location = "EU"  # Change if needed
+        dataset.description = "Budget Updater transaction data storage"
+        dataset = client.create_dataset(dataset, exists_ok=True, retry=CREATE_RETRY, timeout=CREATE_TIMEOUT)
+        logger.info(f"✅ Dataset {dataset_id} ready")
         
         # Create tables
         logger.info("🏗️  Creating BigQuery tables...")
         
-        # Main transactions table
-        create_raw_transactions_table(client, dataset_id)
-        
-        # File processing log table
-        create_file_processing_log_table(client, dataset_id)
+        create_tables(client, dataset_id, with_descriptions=with_descriptions)
         
         logger.info("🎉 BigQuery setup completed successfully!")
         
@@ -232,12 +381,14 @@ def setup_bigquery_dataset_and_tables():
         print(f"Project: {config.gcp_project_id}")
         print(f"Dataset: {dataset_id}")
         print("Tables created:")
-        print("  • raw_transactions - Main transaction storage")
+        print("  • raw_seb, raw_revolut, raw_firstcard, raw_strawberry - Per-bank transaction storage")
+        print("  • raw_transactions_unified - View over the standardized columns of all banks")
+        print("  • mv_daily_<bank> - Materialized per-day totals for each bank")
         print("  • file_processing_log - File processing tracking")
         print("\nNext steps:")
         print("  1. Use upload_transactions.py to load Excel files")
         print("  2. Query data using the standardized columns")
-        print("  3. Access raw columns for bank-specific analysis")
+        print("  3. Access raw columns via JSON_VALUE(raw_payload, '$.<column>')")
         print("="*60)
         
     except Exception as e:
@@ -245,4 +396,8 @@ def setup_bigquery_dataset_and_tables():
         sys.exit(1)
 
 if __name__ == "__main__":
-    setup_bigquery_dataset_and_tables() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Set up Budget Updater BigQuery tables")
+    parser.add_argument("--with-descriptions", action="store_true",
+                        help="Store column descriptions on the tables (for generated docs)")
+    args = parser.parse_args()
+    setup_bigquery_dataset_and_tables(with_descriptions=args.with_descriptions) 
\ No newline at end of file
@@ -11,13 +11,24 @@ Usage:
     python scripts/setup_bigquery_tables_v2.py
 """
 
+from __future__ import annotations
+
+import functools
+import hashlib
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from google.cloud import bigquery
-from google.cloud.exceptions import NotFound, Conflict
+from typing import TYPE_CHECKING, AbstractSet
 import logging
 
+# The BigQuery client pulls in gRPC, protobuf and api-core, so it is imported
+# where it is used rather than when this module is imported
+if TYPE_CHECKING:
+    from google.cloud import bigquery
+
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 from budget_updater.config import Config
@@ -25,182 +36,157 @@ from budget_updater.config import Config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_seb_staging_table(client: bigquery.Client, dataset_id: str):
-    """Create staging table for SEB raw data."""
-    table_id = "seb_transactions_raw"
-    table_ref = client.dataset(dataset_id).table(table_id)
-    
-    schema = [
-        # Metadata
-        bigquery.SchemaField("file_hash", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("source_file", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("upload_timestamp", "TIMESTAMP", mode="REQUIRED"),
-        bigquery.SchemaField("row_number", "INTEGER", mode="REQUIRED"),
-        
-        # SEB Raw Columns (exactly as in Excel)
-        bigquery.SchemaField("bokforingsdatum", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("valutadatum", "STRING", mode="NULLABLE"), 
-        bigquery.SchemaField("verifikationsnummer", "INTEGER", mode="NULLABLE"),
-        bigquery.SchemaField("text", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("belopp", "FLOAT64", mode="NULLABLE"),
-        bigquery.SchemaField("saldo", "FLOAT64", mode="NULLABLE"),
-        
-        # Deduplication
-        bigquery.SchemaField("business_key", "STRING", mode="REQUIRED",
-                            description="Business key for deduplication"),
-    ]
-    
-    table = bigquery.Table(table_ref, schema=schema)
-    table.description = "SEB raw transaction data exactly as exported from Excel"
-    table.time_partitioning = bigquery.TimePartitioning(
-        type_=bigquery.TimePartitioningType.DAY,
-        field="upload_timestamp"
-    )
-    table.clustering_fields = ["file_hash", "upload_timestamp"]
-    
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created staging table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+BIGQUERY_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+# Enough pooled connections for every concurrent table creation
+HTTP_POOL_MAXSIZE = 32
 
-def create_revolut_staging_table(client: bigquery.Client, dataset_id: str):
-    """Create staging table for Revolut raw data."""
-    table_id = "revolut_transactions_raw"
-    table_ref = client.dataset(dataset_id).table(table_id)
-    
-    schema = [
-        # Metadata
-        bigquery.SchemaField("file_hash", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("source_file", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("upload_timestamp", "TIMESTAMP", mode="REQUIRED"),
-        bigquery.SchemaField("row_number", "INTEGER", mode="REQUIRED"),
-        
-        # Revolut Raw Columns
-        bigquery.SchemaField("type", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("product", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("started_date", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("completed_date", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("description", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("amount", "FLOAT64", mode="NULLABLE"),
-        bigquery.SchemaField("fee", "FLOAT64", mode="NULLABLE"),
-        bigquery.SchemaField("currency", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("state", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("balance", "FLOAT64", mode="NULLABLE"),
-        
-        # Deduplication
-        bigquery.SchemaField("business_key", "STRING", mode="REQUIRED",
-                            description="Business key for deduplication"),
-    ]
-    
-    table = bigquery.Table(table_ref, schema=schema)
-    table.description = "Revolut raw transaction data exactly as exported from Excel"
-    table.time_partitioning = bigquery.TimePartitioning(
-        type_=bigquery.TimePartitioningType.DAY,
-        field="upload_timestamp"
-    )
-    table.clustering_fields = ["file_hash", "upload_timestamp"]
-    
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created staging table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+def create_client(project_id: str, pool_maxsize: int = HTTP_POOL_MAXSIZE) -> bigquery.Client:
+    """
+    Create a BigQuery client whose HTTP session can keep all concurrent table
+    creations on their own connections instead of queueing on the default
+    pool of 10.
+    """
+    import google.auth
+    import requests
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+    
+    credentials, _ = google.auth.default(scopes=BIGQUERY_SCOPES)
+    session = AuthorizedSession(credentials)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount("https://bigquery.googleapis.com", adapter)
+    return bigquery.Client(project=project_id, credentials=credentials, _http=session)
 
-def create_firstcard_staging_table(client: bigquery.Client, dataset_id: str):
-    """Create staging table for FirstCard raw data."""
-    table_id = "firstcard_transactions_raw"
-    table_ref = client.dataset(dataset_id).table(table_id)
+# Wall-clock seconds of the last call of each decorated setup step, for
+# spotting slow API calls (keys include keyword arguments such as the bank)
+_timings = {}
+
+def _log_and_reraise(kind: str):
+    """Log failures of a setup step with its name, re-raise, and time the call."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"❌ Failed {kind} in {fn.__name__}: {e}")
+                raise
+            finally:
+                _timings[":".join([fn.__name__, *map(str, kwargs.values())])] = time.perf_counter() - start
+        return wrapper
+    return decorator
+
+# Bank raw columns (exactly as in Excel), as (name, type); all NULLABLE
+STAGING_SCHEMAS = {
+    "seb": [
+        ("bokforingsdatum", "STRING"),
+        ("valutadatum", "STRING"),
+        ("verifikationsnummer", "INTEGER"),
+        ("text", "STRING"),
+        ("belopp", "FLOAT64"),
+        ("saldo", "FLOAT64"),
+    ],
+    "revolut": [
+        ("type", "STRING"),
+        ("product", "STRING"),
+        ("started_date", "STRING"),
+        ("completed_date", "STRING"),
+        ("description", "STRING"),
+        ("amount", "FLOAT64"),
+        ("fee", "FLOAT64"),
+        ("currency", "STRING"),
+        ("state", "STRING"),
+        ("balance", "FLOAT64"),
+    ],
+    "firstcard": [
+        ("datum", "STRING"),
+        ("ytterligare_information", "STRING"),
+        ("reseinformation_inkopsplats", "STRING"),
+        ("valuta", "STRING"),
+        ("vaxlingskurs", "FLOAT64"),
+        ("utlandskt_belopp", "FLOAT64"),
+        ("belopp", "FLOAT64"),
+        ("moms", "FLOAT64"),
+        ("kort", "STRING"),
+    ],
+    "strawberry": [
+        ("datum", "STRING"),
+        ("bokfort", "STRING"),
+        ("specifikation", "STRING"),
+        ("ort", "STRING"),
+        ("valuta", "STRING"),
+        ("utl_belopp_moms", "STRING"),
+        ("belopp", "FLOAT64"),
+    ],
+}
+
+_BANK_DISPLAY_NAMES = {"seb": "SEB", "revolut": "Revolut", "firstcard": "FirstCard", "strawberry": "Strawberry"}
+
+@functools.lru_cache(maxsize=None)
+def _staging_common_fields():
+    """
+    Metadata columns at the start and the deduplication column at the end of
+    every staging table, built once on first use and shared.
+    """
+    from google.cloud import bigquery
     
-    schema = [
-        # Metadata
+    meta = (
         bigquery.SchemaField("file_hash", "STRING", mode="REQUIRED"),
         bigquery.SchemaField("source_file", "STRING", mode="REQUIRED"),
         bigquery.SchemaField("upload_timestamp", "TIMESTAMP", mode="REQUIRED"),
         bigquery.SchemaField("row_number", "INTEGER", mode="REQUIRED"),
-        
-        # FirstCard Raw Columns
-        bigquery.SchemaField("datum", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("ytterligare_information", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("reseinformation_inkopsplats", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("valuta", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("vaxlingskurs", "FLOAT64", mode="NULLABLE"),
-        bigquery.SchemaField("utlandskt_belopp", "FLOAT64", mode="NULLABLE"),
-        bigquery.SchemaField("belopp", "FLOAT64", mode="NULLABLE"),
-        bigquery.SchemaField("moms", "FLOAT64", mode="NULLABLE"),
-        bigquery.SchemaField("kort", "STRING", mode="NULLABLE"),
-        
-        # Deduplication
-        bigquery.SchemaField("business_key", "STRING", mode="REQUIRED",
-                            description="Business key for deduplication"),
-    ]
-    
-    table = bigquery.Table(table_ref, schema=schema)
-    table.description = "FirstCard raw transaction data exactly as exported from Excel"
-    table.time_partitioning = bigquery.TimePartitioning(
-        type_=bigquery.TimePartitioningType.DAY,
-        field="upload_timestamp"
     )
-    table.clustering_fields = ["file_hash", "upload_timestamp"]
-    
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created staging table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+    dedup = bigquery.SchemaField("business_key", "STRING", mode="REQUIRED",
+                                 description="Business key for deduplication")
+    return meta, dedup
 
-def create_strawberry_staging_table(client: bigquery.Client, dataset_id: str):
-    """Create staging table for Strawberry raw data."""
-    table_id = "strawberry_transactions_raw"
+@_log_and_reraise("table")
+def create_staging_table(client: bigquery.Client, dataset_id: str, existing: AbstractSet[str] = frozenset(),
+                         *, bank_name: str):
+    """Create the staging table for one bank's raw data."""
+    from google.cloud import bigquery
+    
+    table_id = f"{bank_name}_transactions_raw"
     table_ref = client.dataset(dataset_id).table(table_id)
+    if table_id in existing:
+        logger.info(f"⏭️  Table {dataset_id}.{table_id} already exists")
+        return table_ref
     
+    meta, dedup = _staging_common_fields()
     schema = [
-        # Metadata
-        bigquery.SchemaField("file_hash", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("source_file", "STRING", mode="REQUIRED"),
-        bigquery.SchemaField("upload_timestamp", "TIMESTAMP", mode="REQUIRED"),
-        bigquery.SchemaField("row_number", "INTEGER", mode="REQUIRED"),
-        
-        # Strawberry Raw Columns
-        bigquery.SchemaField("datum", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("bokfort", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("specifikation", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("ort", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("valuta", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("utl_belopp_moms", "STRING", mode="NULLABLE"),
-        bigquery.SchemaField("belopp", "FLOAT64", mode="NULLABLE"),
-        
-        # Deduplication
-        bigquery.SchemaField("business_key", "STRING", mode="REQUIRED",
-                            description="Business key for deduplication"),
+        *meta,
+        *(bigquery.SchemaField(name, field_type, mode="NULLABLE") for name, field_type in STAGING_SCHEMAS[bank_name]),
+        dedup,
     ]
     
     table = bigquery.Table(table_ref, schema=schema)
-    table.description = "Strawberry raw transaction data exactly as exported from Excel"
+    table.description = f"{_BANK_DISPLAY_NAMES[bank_name]} raw transaction data exactly as exported from Excel"
     table.time_partitioning = bigquery.TimePartitioning(
         type_=bigquery.TimePartitioningType.DAY,
         field="upload_timestamp"
     )
     table.clustering_fields = ["file_hash", "upload_timestamp"]
     
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created staging table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+    table = client.create_table(table, exists_ok=True)
+    logger.info(f"✅ Created staging table {dataset_id}.{table_id}")
+    return table
+
+create_seb_staging_table = partial(create_staging_table, bank_name="seb")
+create_revolut_staging_table = partial(create_staging_table, bank_name="revolut")
+create_firstcard_staging_table = partial(create_staging_table, bank_name="firstcard")
+create_strawberry_staging_table = partial(create_staging_table, bank_name="strawberry")
 
-def create_transactions_standardized_table(client: bigquery.Client, dataset_id: str):
+@_log_and_reraise("table")
+def create_transactions_standardized_table(client: bigquery.Client, dataset_id: str, existing: AbstractSet[str] = frozenset()):
     """Create unified standardized transactions table."""
+    from google.cloud import bigquery
+    
     table_id = "transactions_standardized"
     table_ref = client.dataset(dataset_id).table(table_id)
+    if table_id in existing:
+        logger.info(f"⏭️  Table {dataset_id}.{table_id} already exists")
+        return table_ref
     
     schema = [
         # Primary Key & Metadata
@@ -252,25 +238,28 @@ def create_transactions_standardized_table(client: bigquery.Client, dataset_id:
     table = bigquery.Table(table_ref, schema=schema)
     table.description = "Standardized transactions from all banks in unified format"
     
-    # Optimize for queries by date and bank
+    # Optimize for queries by date and bank: both analysis views group or
+    # filter on source_bank first, date ranges prune further, then category
     table.time_partitioning = bigquery.TimePartitioning(
         type_=bigquery.TimePartitioningType.DAY,
         field="transaction_date"
     )
-    table.clustering_fields = ["source_bank", "category_id"]
+    table.clustering_fields = ["source_bank", "transaction_date", "category_id"]
     
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created standardized table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+    table = client.create_table(table, exists_ok=True)
+    logger.info(f"✅ Created standardized table {dataset_id}.{table_id}")
+    return table
 
-def create_transaction_categories_table(client: bigquery.Client, dataset_id: str):
+@_log_and_reraise("table")
+def create_transaction_categories_table(client: bigquery.Client, dataset_id: str, existing: AbstractSet[str] = frozenset()):
     """Create transaction categories reference table."""
+    from google.cloud import bigquery
+    
     table_id = "transaction_categories"
     table_ref = client.dataset(dataset_id).table(table_id)
+    if table_id in existing:
+        logger.info(f"⏭️  Table {dataset_id}.{table_id} already exists")
+        return table_ref
     
     schema = [
         bigquery.SchemaField("category_id", "STRING", mode="REQUIRED"),
@@ -286,20 +275,22 @@ def create_transaction_categories_table(client: bigquery.Client, dataset_id: str
     
     table = bigquery.Table(table_ref, schema=schema)
     table.description = "Transaction categories for budget classification"
-    table.clustering_fields = ["budget_type", "parent_category_id"]
+    # Small reference table (<1000 rows, nearly all is_active); no partitioning/clustering needed
     
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created categories table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+    table = client.create_table(table, exists_ok=True)
+    logger.info(f"✅ Created categories table {dataset_id}.{table_id}")
+    return table
 
-def create_categorization_rules_table(client: bigquery.Client, dataset_id: str):
+@_log_and_reraise("table")
+def create_categorization_rules_table(client: bigquery.Client, dataset_id: str, existing: AbstractSet[str] = frozenset()):
     """Create automatic categorization rules table."""
+    from google.cloud import bigquery
+    
     table_id = "categorization_rules"
     table_ref = client.dataset(dataset_id).table(table_id)
+    if table_id in existing:
+        logger.info(f"⏭️  Table {dataset_id}.{table_id} already exists")
+        return table_ref
     
     schema = [
         bigquery.SchemaField("rule_id", "STRING", mode="REQUIRED"),
@@ -319,20 +310,22 @@ def create_categorization_rules_table(client: bigquery.Client, dataset_id: str):
     
     table = bigquery.Table(table_ref, schema=schema)
     table.description = "Rules for automatic transaction categorization"
-    table.clustering_fields = ["pattern_type", "is_active"]
+    # Small reference table (<1000 rows, nearly all is_active); no partitioning/clustering needed
     
-    try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created categorization rules table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+    table = client.create_table(table, exists_ok=True)
+    logger.info(f"✅ Created categorization rules table {dataset_id}.{table_id}")
+    return table
 
-def create_file_processing_log_table(client: bigquery.Client, dataset_id: str):
+@_log_and_reraise("table")
+def create_file_processing_log_table(client: bigquery.Client, dataset_id: str, existing: AbstractSet[str] = frozenset()):
     """Create file processing log table."""
+    from google.cloud import bigquery
+    
     table_id = "file_processing_log"
     table_ref = client.dataset(dataset_id).table(table_id)
+    if table_id in existing:
+        logger.info(f"⏭️  Table {dataset_id}.{table_id} already exists")
+        return table_ref
     
     schema = [
         bigquery.SchemaField("file_hash", "STRING", mode="REQUIRED"),
@@ -349,38 +342,61 @@ def create_file_processing_log_table(client: bigquery.Client, dataset_id: str):
     
     table = bigquery.Table(table_ref, schema=schema)
     table.description = "Log of processed files to prevent duplicates"
-    table.clustering_fields = ["source_bank", "processed_timestamp"]
+    # The dedup lookup is WHERE file_hash = ?, so clustering on the hash alone
+    # reads a single block; time partitions keep history range scans cheap
+    table.time_partitioning = bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.MONTH,
+        field="processed_timestamp"
+    )
+    table.clustering_fields = ["file_hash"]
+    
+    table = client.create_table(table, exists_ok=True)
+    logger.info(f"✅ Created file processing log table {dataset_id}.{table_id}")
+    return table
+
+def _get_existing_view(client: bigquery.Client, view_id: str):
+    """Fetch an existing view or materialized view, or None if it doesn't exist."""
+    from google.cloud.exceptions import NotFound
     
     try:
-        table = client.create_table(table, exists_ok=True)
-        logger.info(f"✅ Created file processing log table {dataset_id}.{table_id}")
-        return table
-    except Exception as e:
-        logger.error(f"❌ Failed to create table {dataset_id}.{table_id}: {e}")
-        raise
+        return client.get_table(view_id)
+    except NotFound:
+        return None
 
+@_log_and_reraise("views")
 def create_analysis_views(client: bigquery.Client, dataset_id: str, project_id: str):
-    """Create useful views for analysis."""
+    """
+    Create useful views for analysis.
+    
+    Each view's description holds a hash of its definition, so views whose
+    definition hasn't changed are not recreated on re-runs.
+    
+    monthly_summary is a materialized view that BigQuery refreshes
+    incrementally, so reading it only aggregates newly added transactions.
+    It groups on DATE_TRUNC(transaction_date, MONTH), which follows the
+    table's date partitioning, so it can be partitioned the same way; callers
+    needing year and month EXTRACT them from month_start. Materialized views
+    allow no ORDER BY or expressions over aggregates, so callers sort and
+    round when reading. category_summary has a LEFT JOIN,
+    which materialized views don't support, so it stays a plain view.
+    """
     
-    # Monthly summary view
-    monthly_summary_sql = f"""
-    CREATE OR REPLACE VIEW `{project_id}.{dataset_id}.monthly_summary` AS
+    # view name -> (table type, options before AS, SELECT body)
+    views = {
+        # Monthly summary materialized view
+        "monthly_summary": ("MATERIALIZED_VIEW", "PARTITION BY month_start CLUSTER BY source_bank", f"""
     SELECT 
-        EXTRACT(YEAR FROM transaction_date) as year,
-        EXTRACT(MONTH FROM transaction_date) as month,
+        DATE_TRUNC(transaction_date, MONTH) as month_start,
         source_bank,
         COUNT(*) as transaction_count,
-        ROUND(SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END), 2) as total_expenses,
-        ROUND(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 2) as total_income,
-        ROUND(SUM(amount), 2) as net_amount
+        SUM(IF(amount < 0, amount, 0)) as total_expenses,
+        SUM(IF(amount > 0, amount, 0)) as total_income,
+        SUM(amount) as net_amount
     FROM `{project_id}.{dataset_id}.transactions_standardized`
-    GROUP BY year, month, source_bank
-    ORDER BY year DESC, month DESC, source_bank
-    """
-    
-    # Category summary view  
-    category_summary_sql = f"""
-    CREATE OR REPLACE VIEW `{project_id}.{dataset_id}.category_summary` AS
+    GROUP BY month_start, source_bank
+    """),
+        # Category summary view
+        "category_summary": ("VIEW", "", f"""
     SELECT 
         c.category_name,
         c.budget_type,
@@ -394,124 +410,215 @@ def create_analysis_views(client: bigquery.Client, dataset_id: str, project_id:
         ON t.category_id = c.category_id
     GROUP BY c.category_name, c.budget_type
     ORDER BY total_amount DESC
-    """
-    
-    try:
-        client.query(monthly_summary_sql).result()
-        logger.info(f"✅ Created view {dataset_id}.monthly_summary")
+    """),
+    }
+    
+    statements = []
+    changed = []
+    for view_name, (table_type, options, body) in views.items():
+        view_id = f"{project_id}.{dataset_id}.{view_name}"
+        marker = f"hash:{hashlib.sha256((options + body).encode()).hexdigest()}"
+        existing = _get_existing_view(client, view_id)
+        if existing is not None and existing.description == marker:
+            logger.info(f"⏭️  View {dataset_id}.{view_name} unchanged")
+            continue
+        # CREATE OR REPLACE can't turn a view into a materialized view or back
+        if existing is not None and existing.table_type != table_type:
+            statements.append(f"DROP {existing.table_type.replace('_', ' ')} `{view_id}`")
         
-        client.query(category_summary_sql).result()
-        logger.info(f"✅ Created view {dataset_id}.category_summary")
-        
-    except Exception as e:
-        logger.error(f"❌ Failed to create views: {e}")
-        raise
+        statements.append(f"""
+    CREATE OR REPLACE {table_type.replace("_", " ")} `{view_id}` {options}
+    OPTIONS(description="{marker}") AS{body}""")
+        changed.append(view_name)
+    
+    if not statements:
+        return
+    
+    # All changed views in one multi-statement script job
+    client.query(";\n".join(statements)).result()
+    for view_name in changed:
+        logger.info(f"✅ Created view {dataset_id}.{view_name}")
 
+# Default categories, merged into transaction_categories on setup
+_DEFAULT_CATEGORIES = (
+    # Income categories
+    {"category_id": "INC001", "category_name": "Salary", "category_description": "Monthly salary and wages",
+     "parent_category_id": None, "budget_type": "INCOME"},
+    {"category_id": "INC002", "category_name": "Freelance", "category_description": "Freelance and consulting income",
+     "parent_category_id": None, "budget_type": "INCOME"},
+    {"category_id": "INC003", "category_name": "Investment Returns", "category_description": "Dividends, interest, capital gains",
+     "parent_category_id": None, "budget_type": "INCOME"},
+    {"category_id": "INC004", "category_name": "Other Income", "category_description": "Miscellaneous income",
+     "parent_category_id": None, "budget_type": "INCOME"},
+    
+    # Main expense categories
+    {"category_id": "EXP001", "category_name": "Housing", "category_description": "Rent, mortgage, utilities",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP002", "category_name": "Transportation", "category_description": "Car, public transport, fuel",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP003", "category_name": "Food & Dining", "category_description": "Groceries, restaurants, cafes",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP004", "category_name": "Shopping", "category_description": "Clothes, electronics, general shopping",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP005", "category_name": "Healthcare", "category_description": "Medical, dental, pharmacy",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP006", "category_name": "Entertainment", "category_description": "Movies, sports, hobbies",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP007", "category_name": "Travel", "category_description": "Vacations, business travel",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP008", "category_name": "Education", "category_description": "Courses, books, training",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP009", "category_name": "Insurance", "category_description": "Health, car, home insurance",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP010", "category_name": "Taxes", "category_description": "Income tax, property tax",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    {"category_id": "EXP011", "category_name": "Other Expenses", "category_description": "Miscellaneous expenses",
+     "parent_category_id": None, "budget_type": "EXPENSE"},
+    
+    # Sub-categories for Food
+    {"category_id": "EXP003_01", "category_name": "Groceries", "category_description": "Supermarket shopping",
+     "parent_category_id": "EXP003", "budget_type": "EXPENSE"},
+    {"category_id": "EXP003_02", "category_name": "Restaurants", "category_description": "Dining out",
+     "parent_category_id": "EXP003", "budget_type": "EXPENSE"},
+    {"category_id": "EXP003_03", "category_name": "Fast Food", "category_description": "Quick meals",
+     "parent_category_id": "EXP003", "budget_type": "EXPENSE"},
+    {"category_id": "EXP003_04", "category_name": "Coffee & Cafes", "category_description": "Coffee shops, cafes",
+     "parent_category_id": "EXP003", "budget_type": "EXPENSE"},
+    
+    # Sub-categories for Transportation
+    {"category_id": "EXP002_01", "category_name": "Fuel", "category_description": "Gas for car",
+     "parent_category_id": "EXP002", "budget_type": "EXPENSE"},
+    {"category_id": "EXP002_02", "category_name": "Public Transport", "category_description": "Bus, train, metro",
+     "parent_category_id": "EXP002", "budget_type": "EXPENSE"},
+    {"category_id": "EXP002_03", "category_name": "Taxi & Ride Share", "category_description": "Uber, taxi",
+     "parent_category_id": "EXP002", "budget_type": "EXPENSE"},
+    {"category_id": "EXP002_04", "category_name": "Car Maintenance", "category_description": "Repairs, service",
+     "parent_category_id": "EXP002", "budget_type": "EXPENSE"},
+    
+    # Transfers and savings
+    {"category_id": "TRN001", "category_name": "Bank Transfer", "category_description": "Transfers between accounts",
+     "parent_category_id": None, "budget_type": "TRANSFER"},
+    {"category_id": "SAV001", "category_name": "Savings", "category_description": "Money moved to savings",
+     "parent_category_id": None, "budget_type": "SAVINGS"},
+    {"category_id": "SAV002", "category_name": "Investments", "category_description": "Money invested",
+     "parent_category_id": None, "budget_type": "SAVINGS"},
+)
+
+@_log_and_reraise("default categories")
 def insert_default_categories(client: bigquery.Client, dataset_id: str, project_id: str):
     """Insert default categories into the categories table."""
-    
-    default_categories = [
-        # Income categories
-        ("INC001", "Salary", "Monthly salary and wages", None, "INCOME"),
-        ("INC002", "Freelance", "Freelance and consulting income", None, "INCOME"),
-        ("INC003", "Investment Returns", "Dividends, interest, capital gains", None, "INCOME"),
-        ("INC004", "Other Income", "Miscellaneous income", None, "INCOME"),
-        
-        # Main expense categories
-        ("EXP001", "Housing", "Rent, mortgage, utilities", None, "EXPENSE"),
-        ("EXP002", "Transportation", "Car, public transport, fuel", None, "EXPENSE"),
-        ("EXP003", "Food & Dining", "Groceries, restaurants, cafes", None, "EXPENSE"),
-        ("EXP004", "Shopping", "Clothes, electronics, general shopping", None, "EXPENSE"),
-        ("EXP005", "Healthcare", "Medical, dental, pharmacy", None, "EXPENSE"),
-        ("EXP006", "Entertainment", "Movies, sports, hobbies", None, "EXPENSE"),
-        ("EXP007", "Travel", "Vacations, business travel", None, "EXPENSE"),
-        ("EXP008", "Education", "Courses, books, training", None, "EXPENSE"),
-        ("EXP009", "Insurance", "Health, car, home insurance", None, "EXPENSE"),
-        ("EXP010", "Taxes", "Income tax, property tax", None, "EXPENSE"),
-        ("EXP011", "Other Expenses", "Miscellaneous expenses", None, "EXPENSE"),
-        
-        # Sub-categories for Food
-        ("EXP003_01", "Groceries", "Supermarket shopping", "EXP003", "EXPENSE"),
-        ("EXP003_02", "Restaurants", "Dining out", "EXP003", "EXPENSE"),
-        ("EXP003_03", "Fast Food", "Quick meals", "EXP003", "EXPENSE"),
-        ("EXP003_04", "Coffee & Cafes", "Coffee shops, cafes", "EXP003", "EXPENSE"),
-        
-        # Sub-categories for Transportation
-        ("EXP002_01", "Fuel", "Gas for car", "EXP002", "EXPENSE"),
-        ("EXP002_02", "Public Transport", "Bus, train, metro", "EXP002", "EXPENSE"),
-        ("EXP002_03", "Taxi & Ride Share", "Uber, taxi", "EXP002", "EXPENSE"),
-        ("EXP002_04", "Car Maintenance", "Repairs, service", "EXP002", "EXPENSE"),
-        
-        # Transfers and savings
-        ("TRN001", "Bank Transfer", "Transfers between accounts", None, "TRANSFER"),
-        ("SAV001", "Savings", "Money moved to savings", None, "SAVINGS"),
-        ("SAV002", "Investments", "Money invested", None, "SAVINGS"),
-    ]
-    
-    insert_sql = f"""
-    INSERT INTO `{project_id}.{dataset_id}.transaction_categories` 
-    (category_id, category_name, category_description, parent_category_id, budget_type, is_active, created_at, updated_at)
-    VALUES
+    from google.cloud import bigquery
+    
+    
+    # MERGE on category_id so re-runs are no-ops and only newly added defaults
+    # get inserted; the rows travel as a query parameter, never as SQL text
+    merge_sql = f"""
+    MERGE `{project_id}.{dataset_id}.transaction_categories` AS target
+    USING (SELECT * FROM UNNEST(@categories)) AS source
+    ON target.category_id = source.category_id
+    WHEN NOT MATCHED THEN
+        INSERT (category_id, category_name, category_description, parent_category_id, budget_type, is_active, created_at, updated_at)
+        VALUES (source.category_id, source.category_name, source.category_description, source.parent_category_id,
+                source.budget_type, TRUE, CURRENT_TIMESTAMP(), CURRENT_TIMESTAMP())
     """
     
-    values = []
-    for cat_id, name, desc, parent, budget_type in default_categories:
-        parent_sql = 'NULL' if parent is None else f"'{parent}'"
-        values.append(f"('{cat_id}', '{name}', '{desc}', {parent_sql}, '{budget_type}', TRUE, CURRENT_TIMESTAMP(), CURRENT_TIMESTAMP())")
-    
-    insert_sql += ",\n".join(values)
+    categories = [
+        bigquery.StructQueryParameter(
+            None,
+            *(bigquery.ScalarQueryParameter(name, "STRING", value) for name, value in category.items())
+        )
+        for category in _DEFAULT_CATEGORIES
+    ]
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ArrayQueryParameter("categories", "STRUCT", categories)
+    ])
     
-    try:
-        client.query(insert_sql).result()
-        logger.info(f"✅ Inserted {len(default_categories)} default categories")
-    except Exception as e:
-        logger.error(f"❌ Failed to insert default categories: {e}")
-        raise
+    job = client.query(merge_sql, job_config=job_config)
+    job.result()
+    logger.info(f"✅ Inserted {job.num_dml_affected_rows or 0} new default categories")
+
+# Printed with a single write at the end of a successful setup
+SUMMARY_TEMPLATE = """
+{rule}
+📊 BIGQUERY DATA WAREHOUSE SETUP SUMMARY
+{rule}
+Project: {{project_id}}
+Dataset: {{dataset_id}}
+
+🏗️  ARCHITECTURE:
+   📦 STAGING LAYER (Raw data exactly as from banks):
+      • seb_transactions_raw
+      • revolut_transactions_raw
+      • firstcard_transactions_raw
+      • strawberry_transactions_raw
+
+   🧹 CLEAN LAYER (Standardized format):
+      • transactions_standardized
+
+   📊 BUSINESS LAYER (Categories & rules):
+      • transaction_categories
+      • categorization_rules
+
+   📈 ANALYSIS LAYER (Views):
+      • monthly_summary
+      • category_summary
+
+   ⚙️  OPERATIONAL:
+      • file_processing_log
+
+🚀 NEXT STEPS:
+   1. Use upload_transactions_v2.py to load data into staging
+   2. Transform staging → standardized with ETL script
+   3. Set up categorization rules
+   4. Query standardized tables for analysis
+{rule}
+""".format(rule="=" * 80)
 
 def setup_bigquery_data_warehouse():
     """Main function to set up the complete BigQuery data warehouse."""
+    from google.cloud import bigquery
+    
     try:
         # Initialize config and client
         config = Config()
-        client = bigquery.Client(project=config.gcp_project_id)
+        client = create_client(config.gcp_project_id)
         dataset_id = config.bigquery_dataset_id
         project_id = config.gcp_project_id
         
         # Create dataset if it doesn't exist
+        # create_dataset with exists_ok is idempotent, so no get_dataset pre-check
         dataset_ref = client.dataset(dataset_id)
-        try:
-            dataset = client.get_dataset(dataset_ref)
-            logger.info(f"✅ Dataset {dataset_id} already exists")
-        except NotFound:
-            dataset = bigquery.Dataset(dataset_ref)
-            dataset.location = "EU"  # Change if needed
-            dataset.description = "Budget Updater data warehouse"
-            dataset = client.create_dataset(dataset, exists_ok=True)
-            logger.info(f"✅ Created dataset {dataset_id}")
+        dataset = bigquery.Dataset(dataset_ref)
+        dataset.location = "EU"  # Change if needed
+        dataset.description = "Budget Updater data warehouse"
+        dataset = client.create_dataset(dataset, exists_ok=True)
+        logger.info(f"✅ Dataset {dataset_id} ready")
         
         logger.info("🏗️  Creating BigQuery data warehouse...")
         
-        # 1. STAGING LAYER - Raw data per bank
-        logger.info("📦 Creating staging tables...")
-        create_seb_staging_table(client, dataset_id)
-        create_revolut_staging_table(client, dataset_id)
-        create_firstcard_staging_table(client, dataset_id)
-        create_strawberry_staging_table(client, dataset_id)
-        
-        # 2. CLEAN LAYER - Standardized data
-        logger.info("🧹 Creating standardized tables...")
-        create_transactions_standardized_table(client, dataset_id)
-        
-        # 3. BUSINESS LAYER - Categories and rules
-        logger.info("📊 Creating business tables...")
-        create_transaction_categories_table(client, dataset_id)
-        create_categorization_rules_table(client, dataset_id)
+        # One listing call tells us which tables already exist, so re-runs
+        # skip the per-table create round-trips
+        existing = {table.table_id for table in client.list_tables(dataset_ref)}
         
-        # 4. OPERATIONAL TABLES
-        logger.info("⚙️  Creating operational tables...")
-        create_file_processing_log_table(client, dataset_id)
+        # 1-4. STAGING, CLEAN, BUSINESS AND OPERATIONAL TABLES
+        # The tables don't depend on each other, so their API calls overlap
+        logger.info("📦 Creating staging, standardized, business and operational tables...")
+        table_creators = (
+            create_seb_staging_table,
+            create_revolut_staging_table,
+            create_firstcard_staging_table,
+            create_strawberry_staging_table,
+            create_transactions_standardized_table,
+            create_transaction_categories_table,
+            create_categorization_rules_table,
+            create_file_processing_log_table,
+        )
+        with ThreadPoolExecutor(max_workers=len(table_creators)) as executor:
+            futures = [executor.submit(create, client, dataset_id, existing) for create in table_creators]
+            for future in futures:
+                future.result()
         
-        # 5. ANALYSIS VIEWS
+        # 5. ANALYSIS VIEWS (need the tables above)
         logger.info("📈 Creating analysis views...")
         create_analysis_views(client, dataset_id, project_id)
         
@@ -522,33 +629,7 @@ def setup_bigquery_data_warehouse():
         logger.info("🎉 BigQuery data warehouse setup completed!")
         
         # Print summary
-        print("\n" + "="*80)
-        print("📊 BIGQUERY DATA WAREHOUSE SETUP SUMMARY")
-        print("="*80)
-        print(f"Project: {project_id}")
-        print(f"Dataset: {dataset_id}")
-        print("\n🏗️  ARCHITECTURE:")
-        print("   📦 STAGING LAYER (Raw data exactly as from banks):")
-        print("      • seb_transactions_raw")
-        print("      • revolut_transactions_raw") 
-        print("      • firstcard_transactions_raw")
-        print("      • strawberry_transactions_raw")
-        print("\n   🧹 CLEAN LAYER (Standardized format):")
-        print("      • transactions_standardized")
-        print("\n   📊 BUSINESS LAYER (Categories & rules):")
-        print("      • transaction_categories")
-        print("      • categorization_rules")
-        print("\n   📈 ANALYSIS LAYER (Views):")
-        print("      • monthly_summary")
-        print("      • category_summary")
-        print("\n   ⚙️  OPERATIONAL:")
-        print("      • file_processing_log")
-        print("\n🚀 NEXT STEPS:")
-        print("   1. Use upload_transactions_v2.py to load data into staging")
-        print("   2. Transform staging → standardized with ETL script")
-        print("   3. Set up categorization rules")
-        print("   4. Query standardized tables for analysis")
-        print("="*80)
+        sys.stdout.write(SUMMARY_TEMPLATE.format(project_id=project_id, dataset_id=dataset_id))
         
     except Exception as e:
         logger.error(f"❌ Setup failed: {e}")
@@ -10,6 +10,7 @@ Rules for INFLOW/OUTFLOW:
 - FirstCard['Belopp'] & Strawberry['Belopp']: negative → INFLOW, positive → OUTFLOW
 """
 
+import functools
 import logging
 import sys
 from pathlib import Path
@@ -29,196 +30,258 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Result sets larger than this are read over the BigQuery Storage Read API
+STORAGE_READ_MIN_ROWS = 1000
 
-class SheetTransactionTransformer:
-    """Transforms raw bank data to Google Sheet Transactions format."""
-    
-    def __init__(self, config: Config):
-        self.config = config
-        self.client = bigquery.Client(project=config.gcp_project_id)
-        self.dataset_id = config.bigquery_dataset_id
-    
-    def format_amount(self, amount: float) -> str:
-        """Format amount as string with Swedish number formatting."""
-        if amount == 0:
-            return ""
-        return f"{abs(amount):,.2f}".replace(',', ' ')
-    
-    def transform_seb_to_sheet_transactions_sql(self) -> str:
-        """
-        Generate SQL to transform SEB raw data to sheet_transactions format.
-        SEB Rule: negative belopp → OUTFLOW, positive belopp → INFLOW
-        """
-        return f"""
-        INSERT INTO `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions`
-        (
+SHEET_TRANSACTION_COLUMNS = """
             date, outflow, inflow, category, account, memo, status,
             business_key, source_bank, source_file, upload_timestamp, file_hash,
             amount_numeric, currency, transaction_month, transaction_year
-        )
+        """
+
+# How each raw bank table maps onto sheet_transactions (expressions reference it as `raw`)
+BANK_TRANSFORMS = {
+    'seb': {
+        'source_table': 'seb_transactions_raw',
+        'date_col': 'bokforingsdatum',
+        'account_label': '💰 SEB',
+        'memo_expr': 'COALESCE(raw.text, "")',
+        'amount_expr': 'raw.belopp',
+        'currency_expr': '"SEK"',
+        'sign_rule': 'negative_outflow',
+    },
+    'revolut': {
+        'source_table': 'revolut_transactions_raw',
+        'date_col': 'completed_date',
+        'account_label': '💳 Revolut',
+        'memo_expr': 'COALESCE(raw.description, "")',
+        'amount_expr': '(raw.amount - COALESCE(raw.fee, 0))',
+        'currency_expr': 'COALESCE(raw.currency, "SEK")',
+        'sign_rule': 'negative_outflow',
+    },
+    'firstcard': {
+        'source_table': 'firstcard_transactions_raw',
+        'date_col': 'datum',
+        'account_label': '💳 First Card',
+        'memo_expr': 'COALESCE(raw.reseinformation_inkopsplats, raw.ytterligare_information, "FirstCard Transaction")',
+        'amount_expr': 'raw.belopp',
+        'currency_expr': 'COALESCE(raw.valuta, "SEK")',
+        'sign_rule': 'positive_outflow',
+    },
+    'strawberry': {
+        'source_table': 'strawberry_transactions_raw',
+        'date_col': 'datum',
+        'account_label': '💳 Strawberry',
+        'memo_expr': 'COALESCE(raw.specifikation, "")',
+        'amount_expr': 'raw.belopp',
+        'currency_expr': 'COALESCE(raw.valuta, "SEK")',
+        'sign_rule': 'positive_outflow',
+    },
+}
+
+
+def _build_select_sql(fq_prefix: str, source_table: str, date_col: str, account_label: str,
+                      memo_expr: str, amount_expr: str, currency_expr: str,
+                      sign_rule: str, skip_existing: bool = False) -> str:
+    """
+    Generate a SELECT that maps a raw bank table onto the sheet_transactions columns.
+
+    Expressions must reference the raw table as `raw`. Raw rows sharing a business_key
+    yield a single row, from the earliest upload.
+
+    Args:
+        fq_prefix: "project.dataset" holding the raw and sheet_transactions tables
+        source_table: Raw staging table name (e.g. 'seb_transactions_raw')
+        date_col: Raw date column; the first 10 characters are parsed as YYYY-MM-DD
+        account_label: Value for the account column
+        memo_expr: SQL expression for the memo column
+        amount_expr: SQL expression for the signed amount
+        currency_expr: SQL expression for the currency column
+        sign_rule: 'negative_outflow' (negative → OUTFLOW) or
+                   'positive_outflow' (positive → OUTFLOW)
+        skip_existing: Drop rows whose business_key is already in sheet_transactions
+                       using a LEFT JOIN ... IS NULL anti-join
+    """
+    if sign_rule == 'negative_outflow':
+        outflow = 'WHEN raw._amount < 0 THEN FORMAT("%.2f", ABS(raw._amount))'
+        inflow = 'WHEN raw._amount >= 0 THEN FORMAT("%.2f", raw._amount)'
+    elif sign_rule == 'positive_outflow':
+        outflow = 'WHEN raw._amount > 0 THEN FORMAT("%.2f", raw._amount)  -- REVERSED: positive → OUTFLOW'
+        inflow = 'WHEN raw._amount < 0 THEN FORMAT("%.2f", ABS(raw._amount))  -- REVERSED: negative → INFLOW'
+    else:
+        raise ValueError(f"Unknown sign rule: {sign_rule}")
+
+    # Date and amount are computed once per row in the subquery and reused below
+    sql = f"""
         SELECT 
-            PARSE_DATE('%Y-%m-%d', SUBSTR(bokforingsdatum, 1, 10)) as date,
+            raw._date as date,
             CASE 
-                WHEN belopp < 0 THEN FORMAT("%.2f", ABS(belopp))
+                {outflow}
                 ELSE ""
             END as outflow,
             CASE 
-                WHEN belopp >= 0 THEN FORMAT("%.2f", belopp)
+                {inflow}
                 ELSE ""
             END as inflow,
             "" as category,  -- To be set later
-            "💰 SEB" as account,
-            COALESCE(text, "") as memo,
+            "{account_label}" as account,
+            {memo_expr} as memo,
             "✅" as status,
-            business_key,
-            "seb" as source_bank,
-            source_file,
+            raw.business_key,
+            "{source_table.removesuffix('_transactions_raw')}" as source_bank,
+            raw.source_file,
             CURRENT_TIMESTAMP() as upload_timestamp,
-            file_hash,
-            belopp as amount_numeric,
-            "SEK" as currency,
-            DATE_TRUNC(PARSE_DATE('%Y-%m-%d', SUBSTR(bokforingsdatum, 1, 10)), MONTH) as transaction_month,
-            EXTRACT(YEAR FROM PARSE_DATE('%Y-%m-%d', SUBSTR(bokforingsdatum, 1, 10))) as transaction_year
-        FROM `{self.config.gcp_project_id}.{self.dataset_id}.seb_transactions_raw`
-        WHERE bokforingsdatum IS NOT NULL
-        AND NOT EXISTS (
-            SELECT 1 FROM `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions` st
-            WHERE st.business_key = `{self.config.gcp_project_id}.{self.dataset_id}.seb_transactions_raw`.business_key
-        )
+            raw.file_hash,
+            raw._amount as amount_numeric,
+            {currency_expr} as currency,
+            DATE_TRUNC(raw._date, MONTH) as transaction_month,
+            EXTRACT(YEAR FROM raw._date) as transaction_year
+        FROM (
+            SELECT 
+                raw.*,
+                PARSE_DATE('%Y-%m-%d', SUBSTR(raw.{date_col}, 1, 10)) as _date,
+                {amount_expr} as _amount
+            FROM `{fq_prefix}.{source_table}` raw
+            WHERE raw.{date_col} IS NOT NULL
+            -- Re-uploaded raw rows repeat a business_key; keep the first upload only
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY raw.business_key ORDER BY raw.upload_timestamp) = 1
+        ) raw"""
+
+    if skip_existing:
+        # Only months present in the raw table are read, so monthly partitions are pruned
+        sql += f"""
+        LEFT JOIN (
+            SELECT business_key
+            FROM `{fq_prefix}.sheet_transactions`
+            WHERE transaction_month IN (
+                SELECT DISTINCT DATE_TRUNC(PARSE_DATE('%Y-%m-%d', SUBSTR({date_col}, 1, 10)), MONTH)
+                FROM `{fq_prefix}.{source_table}`
+                WHERE {date_col} IS NOT NULL
+            )
+        ) st
+            ON st.business_key = raw.business_key
+        WHERE st.business_key IS NULL
         """
+    return sql
+
+
+@functools.lru_cache(maxsize=None)
+def _bank_transform_sql(project_id: str, dataset_id: str, source_bank: str) -> str:
+    """
+    Generate SQL that inserts one bank's new raw rows into sheet_transactions.
+    
+    Rows whose business_key already exists in sheet_transactions are skipped. The SQL
+    depends only on the arguments, so it is built once per process.
+    """
+    fq_prefix = f"{project_id}.{dataset_id}"
+    return f"""
+        INSERT INTO `{fq_prefix}.sheet_transactions`
+        ({SHEET_TRANSACTION_COLUMNS})""" + _build_select_sql(
+        fq_prefix, **BANK_TRANSFORMS[source_bank], skip_existing=True
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _all_banks_merge_sql(project_id: str, dataset_id: str) -> str:
+    """Generate the MERGE that inserts new rows from every raw bank table."""
+    fq_prefix = f"{project_id}.{dataset_id}"
+    unioned = "\n        UNION ALL\n".join(
+        _build_select_sql(fq_prefix, **bank_transform) for bank_transform in BANK_TRANSFORMS.values()
+    )
+    return f"""
+        MERGE `{fq_prefix}.sheet_transactions` t
+        USING (
+        WITH unioned AS ({unioned})
+        SELECT * FROM unioned
+        ) s
+        ON t.business_key = s.business_key
+        AND t.transaction_month = s.transaction_month
+        WHEN NOT MATCHED THEN
+            INSERT ({SHEET_TRANSACTION_COLUMNS})
+            VALUES ({SHEET_TRANSACTION_COLUMNS})
+        """
+
+
+@functools.lru_cache(maxsize=None)
+def _all_banks_merge_counts_sql(project_id: str, dataset_id: str) -> str:
+    """
+    Generate a script that runs the all-banks MERGE and returns rows inserted per bank.
+    
+    Per-bank row counts are taken before and after the MERGE inside one transaction,
+    so only this run's inserts are counted; only the source_bank column is read.
+    """
+    fq_prefix = f"{project_id}.{dataset_id}"
+    count_sql = f"""
+            SELECT source_bank, COUNT(*) AS row_count
+            FROM `{fq_prefix}.sheet_transactions`
+            GROUP BY source_bank"""
+    return f"""
+        BEGIN TRANSACTION;
+        CREATE TEMP TABLE counts_before AS {count_sql};
+        {_all_banks_merge_sql(project_id, dataset_id).strip()};
+        CREATE TEMP TABLE inserted_counts AS
+        SELECT source_bank, counts_after.row_count - IFNULL(counts_before.row_count, 0) AS count
+        FROM ({count_sql}
+        ) counts_after
+        LEFT JOIN counts_before USING (source_bank);
+        COMMIT TRANSACTION;
+        SELECT source_bank, count FROM inserted_counts;
+        """
+
+
+class SheetTransactionTransformer:
+    """Transforms raw bank data to Google Sheet Transactions format."""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.client = bigquery.Client(project=config.gcp_project_id)
+        self.dataset_id = config.bigquery_dataset_id
+        self.fq_prefix = f"{config.gcp_project_id}.{self.dataset_id}"
+        self._bqs = None
+    
+    def _get_bqstorage_client(self):
+        """Create the BigQuery Storage read client on first use."""
+        if self._bqs is None:
+            from google.cloud import bigquery_storage
+            self._bqs = bigquery_storage.BigQueryReadClient()
+        return self._bqs
+    
+    def transform_seb_to_sheet_transactions_sql(self) -> str:
+        """
+        Generate SQL to transform SEB raw data to sheet_transactions format.
+        SEB Rule: negative belopp → OUTFLOW, positive belopp → INFLOW
+        """
+        return _bank_transform_sql(self.config.gcp_project_id, self.dataset_id, 'seb')
     
     def transform_revolut_to_sheet_transactions_sql(self) -> str:
         """
         Generate SQL to transform Revolut raw data to sheet_transactions format.
         Revolut Rule: negative amount → OUTFLOW, positive amount → INFLOW
         """
-        return f"""
-        INSERT INTO `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions`
-        (
-            date, outflow, inflow, category, account, memo, status,
-            business_key, source_bank, source_file, upload_timestamp, file_hash,
-            amount_numeric, currency, transaction_month, transaction_year
-        )
-        SELECT 
-            PARSE_DATE('%Y-%m-%d', SUBSTR(completed_date, 1, 10)) as date,
-            CASE 
-                WHEN (amount - COALESCE(fee, 0)) < 0 THEN FORMAT("%.2f", ABS(amount - COALESCE(fee, 0)))
-                ELSE ""
-            END as outflow,
-            CASE 
-                WHEN (amount - COALESCE(fee, 0)) >= 0 THEN FORMAT("%.2f", (amount - COALESCE(fee, 0)))
-                ELSE ""
-            END as inflow,
-            "" as category,  -- To be set later
-            "💳 Revolut" as account,
-            COALESCE(description, "") as memo,
-            "✅" as status,
-            business_key,
-            "revolut" as source_bank,
-            source_file,
-            CURRENT_TIMESTAMP() as upload_timestamp,
-            file_hash,
-            (amount - COALESCE(fee, 0)) as amount_numeric,
-            COALESCE(currency, "SEK") as currency,
-            DATE_TRUNC(PARSE_DATE('%Y-%m-%d', SUBSTR(completed_date, 1, 10)), MONTH) as transaction_month,
-            EXTRACT(YEAR FROM PARSE_DATE('%Y-%m-%d', SUBSTR(completed_date, 1, 10))) as transaction_year
-        FROM `{self.config.gcp_project_id}.{self.dataset_id}.revolut_transactions_raw`
-        WHERE completed_date IS NOT NULL
-        AND NOT EXISTS (
-            SELECT 1 FROM `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions` st
-            WHERE st.business_key = `{self.config.gcp_project_id}.{self.dataset_id}.revolut_transactions_raw`.business_key
-        )
-        """
+        return _bank_transform_sql(self.config.gcp_project_id, self.dataset_id, 'revolut')
     
     def transform_firstcard_to_sheet_transactions_sql(self) -> str:
         """
         Generate SQL to transform FirstCard raw data to sheet_transactions format.
         FirstCard Rule: negative belopp → INFLOW, positive belopp → OUTFLOW
         """
-        return f"""
-        INSERT INTO `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions`
-        (
-            date, outflow, inflow, category, account, memo, status,
-            business_key, source_bank, source_file, upload_timestamp, file_hash,
-            amount_numeric, currency, transaction_month, transaction_year
-        )
-        SELECT 
-            PARSE_DATE('%Y-%m-%d', SUBSTR(datum, 1, 10)) as date,
-            CASE 
-                WHEN belopp > 0 THEN FORMAT("%.2f", belopp)  -- REVERSED: positive → OUTFLOW
-                ELSE ""
-            END as outflow,
-            CASE 
-                WHEN belopp < 0 THEN FORMAT("%.2f", ABS(belopp))  -- REVERSED: negative → INFLOW
-                ELSE ""
-            END as inflow,
-            "" as category,  -- To be set later
-            "💳 First Card" as account,
-            COALESCE(
-                reseinformation_inkopsplats, 
-                ytterligare_information, 
-                "FirstCard Transaction"
-            ) as memo,
-            "✅" as status,
-            business_key,
-            "firstcard" as source_bank,
-            source_file,
-            CURRENT_TIMESTAMP() as upload_timestamp,
-            file_hash,
-            belopp as amount_numeric,
-            COALESCE(valuta, "SEK") as currency,
-            DATE_TRUNC(PARSE_DATE('%Y-%m-%d', SUBSTR(datum, 1, 10)), MONTH) as transaction_month,
-            EXTRACT(YEAR FROM PARSE_DATE('%Y-%m-%d', SUBSTR(datum, 1, 10))) as transaction_year
-        FROM `{self.config.gcp_project_id}.{self.dataset_id}.firstcard_transactions_raw`
-        WHERE datum IS NOT NULL
-        AND NOT EXISTS (
-            SELECT 1 FROM `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions` st
-            WHERE st.business_key = `{self.config.gcp_project_id}.{self.dataset_id}.firstcard_transactions_raw`.business_key
-        )
-        """
+        return _bank_transform_sql(self.config.gcp_project_id, self.dataset_id, 'firstcard')
     
     def transform_strawberry_to_sheet_transactions_sql(self) -> str:
         """
         Generate SQL to transform Strawberry raw data to sheet_transactions format.
         Strawberry Rule: negative belopp → INFLOW, positive belopp → OUTFLOW
         """
-        return f"""
-        INSERT INTO `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions`
-        (
-            date, outflow, inflow, category, account, memo, status,
-            business_key, source_bank, source_file, upload_timestamp, file_hash,
-            amount_numeric, currency, transaction_month, transaction_year
-        )
-        SELECT 
-            PARSE_DATE('%Y-%m-%d', SUBSTR(datum, 1, 10)) as date,
-            CASE 
-                WHEN belopp > 0 THEN FORMAT("%.2f", belopp)  -- REVERSED: positive → OUTFLOW
-                ELSE ""
-            END as outflow,
-            CASE 
-                WHEN belopp < 0 THEN FORMAT("%.2f", ABS(belopp))  -- REVERSED: negative → INFLOW
-                ELSE ""
-            END as inflow,
-            "" as category,  -- To be set later
-            "💳 Strawberry" as account,
-            COALESCE(specifikation, "") as memo,
-            "✅" as status,
-            business_key,
-            "strawberry" as source_bank,
-            source_file,
-            CURRENT_TIMESTAMP() as upload_timestamp,
-            file_hash,
-            belopp as amount_numeric,
-            COALESCE(valuta, "SEK") as currency,
-            DATE_TRUNC(PARSE_DATE('%Y-%m-%d', SUBSTR(datum, 1, 10)), MONTH) as transaction_month,
-            EXTRACT(YEAR FROM PARSE_DATE('%Y-%m-%d', SUBSTR(datum, 1, 10))) as transaction_year
-        FROM `{self.config.gcp_project_id}.{self.dataset_id}.strawberry_transactions_raw`
-        WHERE datum IS NOT NULL
-        AND NOT EXISTS (
-            SELECT 1 FROM `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions` st
-            WHERE st.business_key = `{self.config.gcp_project_id}.{self.dataset_id}.strawberry_transactions_raw`.business_key
-        )
+        return _bank_transform_sql(self.config.gcp_project_id, self.dataset_id, 'strawberry')
+    
+    def transform_all_banks_merge_sql(self) -> str:
+        """
+        Generate a single MERGE that inserts new rows from all four raw bank tables.
+        
+        Each bank is normalized (including its sign rule) in its own UNION ALL branch;
+        the MERGE inserts only business keys not yet in sheet_transactions.
         """
+        return _all_banks_merge_sql(self.config.gcp_project_id, self.dataset_id)
     
     def transform_bank_to_sheet_transactions(self, source_bank: str) -> int:
         """
@@ -230,17 +293,10 @@ class SheetTransactionTransformer:
         Returns:
             Number of rows inserted
         """
-        sql_map = {
-            'seb': self.transform_seb_to_sheet_transactions_sql,
-            'revolut': self.transform_revolut_to_sheet_transactions_sql,
-            'firstcard': self.transform_firstcard_to_sheet_transactions_sql,
-            'strawberry': self.transform_strawberry_to_sheet_transactions_sql
-        }
-        
-        if source_bank not in sql_map:
+        if source_bank not in BANK_TRANSFORMS:
             raise ValueError(f"Unknown source bank: {source_bank}")
         
-        sql_query = sql_map[source_bank]()
+        sql_query = _bank_transform_sql(self.config.gcp_project_id, self.dataset_id, source_bank)
         
         logger.info(f"Transforming {source_bank} data to sheet_transactions...")
         
@@ -261,29 +317,30 @@ class SheetTransactionTransformer:
     
     def transform_all_banks_to_sheet_transactions(self) -> Dict[str, int]:
         """
-        Transform all bank data to sheet_transactions table.
+        Transform all bank data to sheet_transactions table with a single MERGE.
         
         Returns:
             Dictionary mapping bank names to number of rows inserted
         """
-        banks = ['seb', 'revolut', 'firstcard', 'strawberry']
-        results = {}
-        total_inserted = 0
+        results = {bank: 0 for bank in BANK_TRANSFORMS}
         
-        for bank in banks:
-            try:
-                rows_inserted = self.transform_bank_to_sheet_transactions(bank)
-                results[bank] = rows_inserted
-                total_inserted += rows_inserted
-                
-                if rows_inserted > 0:
-                    logger.info(f"✅ {bank.upper()}: {rows_inserted} transactions inserted")
-                else:
-                    logger.info(f"ℹ️  {bank.upper()}: No new transactions to insert")
+        try:
+            # The script's final SELECT returns this run's inserts per bank
+            script = _all_banks_merge_counts_sql(self.config.gcp_project_id, self.dataset_id)
+            for row in self.client.query(script).result():
+                if row.source_bank in results:
+                    results[row.source_bank] = row.count
+            total_inserted = sum(results.values())
                     
-            except Exception as e:
-                logger.error(f"❌ {bank.upper()}: Failed - {e}")
-                results[bank] = 0
+        except Exception as e:
+            logger.error(f"❌ Failed to transform bank data: {e}")
+            return results
+        
+        for bank, rows_inserted in results.items():
+            if rows_inserted > 0:
+                logger.info(f"✅ {bank.upper()}: {rows_inserted} transactions inserted")
+            else:
+                logger.info(f"ℹ️  {bank.upper()}: No new transactions to insert")
         
         logger.info(f"\n🎉 Total transactions inserted: {total_inserted}")
         return results
@@ -294,7 +351,7 @@ class SheetTransactionTransformer:
         SELECT 
             date, outflow, inflow, category, account, memo, status,
             source_bank, amount_numeric, currency
-        FROM `{self.config.gcp_project_id}.{self.dataset_id}.sheet_transactions`
+        FROM `{self.fq_prefix}.sheet_transactions`
         ORDER BY date DESC
         LIMIT {limit}
         """
@@ -302,10 +359,17 @@ class SheetTransactionTransformer:
         logger.info(f"📊 Sample transactions from sheet_transactions table:")
         
         try:
-            result = self.client.query(query).result()
+            job = self.client.query(query)
+            if limit > STORAGE_READ_MIN_ROWS:
+                # Large samples stream back as Arrow over gRPC instead of REST/JSON pages
+                rows = job.to_arrow(bqstorage_client=self._get_bqstorage_client()).to_pylist()
+            else:
+                rows = job.result()
             
-            for row in result:
-                logger.info(f"  {row.date} | {row.account} | {row.outflow or row.inflow} | {row.memo[:50]}...")
+            for row in rows:
+                memo = (row['memo'] or '')[:50]
+                logger.info("  %s | %s | %s | %s...",
+                            row['date'], row['account'], row['outflow'] or row['inflow'], memo)
                 
         except Exception as e:
             logger.error(f"Failed to fetch sample transactions: {e}")
@@ -6,12 +6,14 @@ This script takes a validated staging file and safely uploads the transactions
 to the firstcard_transactions_raw BigQuery table with backup and safety features.
 """
 
+import io
 import logging
 import sys
 import json
+from itertools import chain, islice
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 
 # Add project root to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
@@ -19,6 +21,18 @@ sys.path.append(str(Path(__file__).parent.parent))
 from google.cloud import bigquery
 from src.budget_updater.config import Config
 
+# orjson parses/serializes staging files in native code; stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ijson streams transactions out of large staging files; without it the whole file is parsed
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,32 +40,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Rows per insert_rows_json request (BigQuery recommends ~500 for streaming inserts)
+STREAMING_BATCH_SIZE = 500
+
+# Uploads at least this large are written with a load job instead of streaming inserts
+LOAD_JOB_MIN_ROWS = 500
+
+# Backup snapshots expire automatically after this many days
+BACKUP_RETENTION_DAYS = 30
+
+
+def _read_json(path: Path):
+    """Parse a JSON file, using orjson when available."""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read()) if orjson else json.load(f)
+
+
+def _iter_staging_transactions(path: Path) -> Iterator[Dict]:
+    """Yield staging file transactions one at a time with ijson."""
+    with open(path, 'rb') as f:
+        yield from ijson.items(f, 'transactions.item', use_float=True)
+
+
+def _count_staging_transactions(path: Path) -> int:
+    """
+    Parse a whole staging file with ijson, returning its number of transactions.
+    
+    Only parser events are read, so no transaction objects are built. A malformed
+    or truncated file raises ijson.JSONError.
+    """
+    with open(path, 'rb') as f:
+        return sum(1 for prefix, event, _ in ijson.parse(f)
+                   if prefix == 'transactions.item' and event == 'start_map')
+
+
+def _batched(iterable: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Yield lists of up to size items from iterable."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
 
 class FirstCardUploader:
     """Upload validated FirstCard staging file to BigQuery."""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, batch_size: int = STREAMING_BATCH_SIZE,
+                 prefer_load_job: bool = True, force: bool = False):
         self.config = config
         self.client = bigquery.Client(project=config.gcp_project_id)
         self.dataset_id = config.bigquery_dataset_id
         self.table_id = 'firstcard_transactions_raw'
+        self.full_table_name = f"{config.gcp_project_id}.{self.dataset_id}.{self.table_id}"
+        self.fq_table = f"`{self.full_table_name}`"
+        self.table_ref = bigquery.TableReference.from_string(self.full_table_name)
+        self.batch_size = batch_size
+        self.prefer_load_job = prefer_load_job
+        self.force = force
     
-    def load_staging_file(self, staging_file: Path) -> Dict:
-        """Load and parse staging file."""
+    def load_staging_file(self, staging_file: Path) -> Tuple[Dict, Iterator[Dict]]:
+        """
+        Load staging file metadata and an iterator over its transactions.
+        
+        With ijson the transactions are parsed lazily while they are consumed, after
+        one validating pass over the file. Either way the transaction count must match
+        metadata.total_transactions, so a bad file fails before anything is written.
+        """
         try:
             logger.info(f"📖 Loading staging file: {staging_file}")
             
             if not staging_file.exists():
                 raise FileNotFoundError(f"Staging file not found: {staging_file}")
             
-            with open(staging_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if ijson:
+                # Metadata is written before transactions, so this stops near the top
+                with open(staging_file, 'rb') as f:
+                    metadata = next(ijson.items(f, 'metadata', use_float=True), {})
+                transaction_count = _count_staging_transactions(staging_file)
+                transactions = _iter_staging_transactions(staging_file)
+            else:
+                data = _read_json(staging_file)
+                metadata = data.get('metadata', {})
+                transaction_list = data.get('transactions', [])
+                transaction_count = len(transaction_list)
+                transactions = iter(transaction_list)
+            
+            expected_count = metadata.get('total_transactions')
+            if expected_count is not None and expected_count != transaction_count:
+                raise ValueError(f"Staging file lists {expected_count} transactions "
+                                 f"but contains {transaction_count}")
             
             logger.info(f"✅ Loaded staging file ({staging_file.stat().st_size:,} bytes)")
-            return data
+            return metadata, transactions
             
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON in staging file: {e}")
+        except ValueError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Failed to load staging file: {e}")
     
@@ -64,8 +148,7 @@ class FirstCardUploader:
             return self.prompt_continue("Continue without validation report?")
         
         try:
-            with open(report_file, 'r', encoding='utf-8') as f:
-                report = json.load(f)
+            report = _read_json(report_file)
             
             is_valid = report.get('validation_results', {}).get('is_valid', False)
             error_count = report.get('validation_results', {}).get('error_count', 0)
@@ -93,7 +176,9 @@ class FirstCardUploader:
             return self.prompt_continue("Continue without readable validation report?")
     
     def prompt_continue(self, message: str) -> bool:
-        """Prompt user to continue (for interactive mode)."""
+        """Prompt user to continue (for interactive mode); always continue when forced."""
+        if self.force:
+            return True
         try:
             response = input(f"{message} (y/N): ").strip().lower()
             return response in ['y', 'yes']
@@ -101,13 +186,13 @@ class FirstCardUploader:
             return False
     
     def create_backup(self) -> Optional[str]:
-        """Create backup of existing firstcard_transactions_raw table."""
+        """Create a snapshot backup of existing firstcard_transactions_raw table."""
         backup_table = f"firstcard_transactions_raw_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         # First check if source table exists and has data
         check_query = f"""
         SELECT COUNT(*) as count
-        FROM `{self.config.gcp_project_id}.{self.dataset_id}.{self.table_id}`
+        FROM {self.fq_table}
         """
         
         try:
@@ -118,100 +203,109 @@ class FirstCardUploader:
                 logger.info("ℹ️  No existing data to backup")
                 return None
             
-            logger.info(f"📦 Creating backup of {row_count:,} existing rows...")
+            logger.info(f"📦 Creating snapshot backup of {row_count:,} existing rows...")
             
+            # Zero-copy snapshot: only bytes changed later in the source are billed
             backup_query = f"""
-            CREATE TABLE `{self.config.gcp_project_id}.{self.dataset_id}.{backup_table}` AS
-            SELECT * FROM `{self.config.gcp_project_id}.{self.dataset_id}.{self.table_id}`
+            CREATE SNAPSHOT TABLE `{self.config.gcp_project_id}.{self.dataset_id}.{backup_table}`
+            CLONE {self.fq_table}
+            OPTIONS (
+                expiration_timestamp = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL {BACKUP_RETENTION_DAYS} DAY)
+            )
             """
             
             job = self.client.query(backup_query)
             job.result()  # Wait for completion
             
-            logger.info(f"✅ Created backup table: {backup_table}")
+            logger.info(f"✅ Created backup snapshot: {backup_table}")
+            logger.info(f"   Restore with: CREATE OR REPLACE TABLE {self.fq_table} "
+                        f"CLONE `{self.config.gcp_project_id}.{self.dataset_id}.{backup_table}`")
             return backup_table
             
         except Exception as e:
             logger.error(f"Failed to create backup: {e}")
             raise
     
-    def prepare_transactions_for_upload(self, transactions: List[Dict]) -> List[Dict]:
-        """Prepare transactions for BigQuery upload by cleaning debug fields."""
-        clean_transactions = []
-        
-        for transaction in transactions:
-            # Remove debug fields and update timestamp
-            clean_transaction = {k: v for k, v in transaction.items() 
-                               if not k.startswith('_debug')}
-            
-            # Update upload timestamp to current time
-            clean_transaction['upload_timestamp'] = datetime.now(timezone.utc).isoformat()
-            
-            clean_transactions.append(clean_transaction)
-        
-        return clean_transactions
-    
-    def check_for_existing_duplicates(self, transactions: List[Dict]) -> List[str]:
-        """Check for existing duplicates in BigQuery."""
-        business_keys = [t.get('business_key') for t in transactions if t.get('business_key')]
+    def prepare_transactions_for_upload(self, transactions: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Prepare transactions for BigQuery upload by stamping the upload time.
         
-        if not business_keys:
-            return []
+        _debug fields are left in place; BigQuery drops them as unknown values.
+        """
+        # The whole upload shares one timestamp
+        upload_timestamp = datetime.now(timezone.utc).isoformat()
         
-        try:
-            placeholders = ', '.join([f"'{key}'" for key in business_keys])
-            query = f"""
-            SELECT business_key
-            FROM `{self.config.gcp_project_id}.{self.dataset_id}.{self.table_id}`
-            WHERE business_key IN ({placeholders})
-            """
-            
-            result = self.client.query(query).result()
-            existing_keys = [row.business_key for row in result]
-            
-            return existing_keys
-            
-        except Exception as e:
-            logger.warning(f"Could not check for duplicates: {e}")
-            return []
+        for transaction in transactions:
+            transaction['upload_timestamp'] = upload_timestamp
+            yield transaction
     
-    def filter_out_duplicates(self, transactions: List[Dict], 
-                            existing_keys: List[str]) -> List[Dict]:
-        """Filter out transactions that already exist."""
-        if not existing_keys:
-            return transactions
+    def _upload_via_load_job(self, transactions: Iterable[Dict]) -> int:
+        """Append transactions to BigQuery table with a single load job."""
+        table = self.client.get_table(self.table_ref)
+        job_config = bigquery.LoadJobConfig(
+            schema=table.schema,
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            ignore_unknown_values=True
+        )
         
-        existing_set = set(existing_keys)
-        new_transactions = [t for t in transactions 
-                          if t.get('business_key') not in existing_set]
+        # Only the encoded NDJSON is held in memory, not the parsed rows
+        buffer = io.BytesIO()
+        count = 0
+        for transaction in transactions:
+            buffer.write(orjson.dumps(transaction) if orjson else json.dumps(transaction).encode())
+            buffer.write(b"\n")
+            count += 1
+        buffer.seek(0)
         
-        duplicate_count = len(transactions) - len(new_transactions)
-        if duplicate_count > 0:
-            logger.info(f"🔍 Filtered out {duplicate_count} existing duplicates")
+        self.client.load_table_from_file(buffer, self.table_ref, job_config=job_config).result()
         
-        return new_transactions
+        logger.info(f"✅ Successfully loaded {count} transactions")
+        return count
     
-    def upload_transactions(self, transactions: List[Dict]) -> int:
-        """Upload transactions to BigQuery table."""
-        if not transactions:
+    def upload_transactions(self, transactions: Iterable[Dict], dedupe: bool = True) -> int:
+        """
+        Upload transactions to BigQuery table.
+        
+        With dedupe, streamed rows use their business_key as insert ID so BigQuery drops
+        retried duplicates; lasting dedup happens in the sheet_transactions MERGE.
+        Streaming stops at the first rejected batch and raises RuntimeError.
+        """
+        transactions = iter(transactions)
+        head = list(islice(transactions, LOAD_JOB_MIN_ROWS))
+        if not head:
             logger.info("ℹ️  No transactions to upload")
             return 0
         
-        table_ref = self.client.dataset(self.dataset_id).table(self.table_id)
-        
         try:
-            logger.info(f"📤 Uploading {len(transactions)} transactions to BigQuery...")
+            logger.info(f"📤 Uploading transactions to BigQuery...")
             
-            errors = self.client.insert_rows_json(table_ref, transactions)
+            if self.prefer_load_job and len(head) >= LOAD_JOB_MIN_ROWS:
+                # One load job instead of streaming every row
+                return self._upload_via_load_job(chain(head, transactions))
             
-            if errors:
-                logger.error(f"❌ Failed to insert rows:")
-                for error in errors:
-                    logger.error(f"   {error}")
-                return 0
+            uploaded = 0
+            for batch_number, chunk in enumerate(_batched(chain(head, transactions), self.batch_size), 1):
+                row_ids = [t['business_key'] for t in chunk] if dedupe else None
+                errors = self.client.insert_rows_json(
+                    self.table_ref, chunk, row_ids=row_ids,
+                    ignore_unknown_values=True, skip_invalid_rows=False
+                )
+                if errors:
+                    # Stop at the first rejected batch; a partial upload is a failure
+                    logger.error(f"❌ Failed to insert rows in batch {batch_number}:")
+                    for error in errors:
+                        logger.error(f"   {error}")
+                    raise RuntimeError(
+                        f"Batch {batch_number} was rejected after {uploaded} transactions were uploaded"
+                    )
+                uploaded += len(chunk)
+                
+                if batch_number % 10 == 0:
+                    logger.info(f"   {uploaded} transactions uploaded")
             
-            logger.info(f"✅ Successfully uploaded {len(transactions)} transactions")
-            return len(transactions)
+            logger.info(f"✅ Successfully uploaded {uploaded} transactions")
+            return uploaded
             
         except Exception as e:
             logger.error(f"❌ Failed to upload transactions: {e}")
@@ -225,7 +319,7 @@ class FirstCardUploader:
             'staging_file': str(staging_file),
             'uploaded_transactions': uploaded_count,
             'backup_table': backup_table,
-            'target_table': f"{self.config.gcp_project_id}.{self.dataset_id}.{self.table_id}"
+            'target_table': self.full_table_name
         }
         
         return summary
@@ -235,8 +329,13 @@ class FirstCardUploader:
         summary_file = staging_file.with_suffix('.upload_summary.json')
         
         try:
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                json.dump(summary, f, indent=2, ensure_ascii=False)
+            if orjson:
+                summary_file.write_bytes(
+                    orjson.dumps(summary, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+                )
+            else:
+                with open(summary_file, 'w', encoding='utf-8') as f:
+                    json.dump(summary, f, indent=2, ensure_ascii=False)
             
             logger.info(f"📄 Upload summary saved: {summary_file}")
             return summary_file
@@ -255,7 +354,7 @@ class FirstCardUploader:
         Args:
             staging_file: Path to staging file
             create_backup: Whether to create backup before upload
-            skip_duplicates: Whether to filter out existing duplicates
+            skip_duplicates: Whether to use business keys as insert IDs for dedup
             dry_run: If True, don't actually upload (just validate and prepare)
             
         Returns:
@@ -269,15 +368,15 @@ class FirstCardUploader:
             return 0
         
         # Step 2: Load staging file
-        data = self.load_staging_file(staging_file)
-        transactions = data.get('transactions', [])
-        metadata = data.get('metadata', {})
+        metadata, transactions = self.load_staging_file(staging_file)
         
-        if not transactions:
+        first_transaction = next(transactions, None)
+        if first_transaction is None:
             logger.info("ℹ️  No transactions to upload")
             return 0
+        transactions = chain([first_transaction], transactions)
         
-        logger.info(f"📋 Found {len(transactions)} transactions in staging file")
+        logger.info(f"📋 Staging file lists {metadata.get('total_transactions', '?')} transactions")
         
         # Step 3: Create backup if requested
         backup_table = None
@@ -287,24 +386,15 @@ class FirstCardUploader:
         # Step 4: Prepare transactions
         clean_transactions = self.prepare_transactions_for_upload(transactions)
         
-        # Step 5: Check for duplicates
-        if skip_duplicates:
-            logger.info("🔍 Checking for existing duplicates...")
-            existing_keys = self.check_for_existing_duplicates(clean_transactions)
-            clean_transactions = self.filter_out_duplicates(clean_transactions, existing_keys)
-        
-        if not clean_transactions:
-            logger.info("ℹ️  No new transactions to upload after duplicate filtering")
-            return 0
-        
-        # Step 6: Upload (or simulate for dry run)
+        # Step 5: Upload (or simulate for dry run); already-uploaded business keys are
+        # skipped by the sheet_transactions MERGE rather than probed here
         if dry_run:
-            logger.info(f"🧪 DRY RUN: Would upload {len(clean_transactions)} transactions")
-            uploaded_count = len(clean_transactions)
+            uploaded_count = sum(1 for _ in clean_transactions)
+            logger.info(f"🧪 DRY RUN: Would upload {uploaded_count} transactions")
         else:
-            uploaded_count = self.upload_transactions(clean_transactions)
+            uploaded_count = self.upload_transactions(clean_transactions, dedupe=skip_duplicates)
         
-        # Step 7: Create summary
+        # Step 6: Create summary
         if uploaded_count > 0:
             summary = self.create_upload_summary(staging_file, uploaded_count, backup_table)
             if not dry_run:
@@ -331,7 +421,7 @@ def main():
     parser.add_argument("--no-backup", action="store_true", 
                        help="Skip creating backup table")
     parser.add_argument("--allow-duplicates", action="store_true",
-                       help="Don't filter out existing duplicates")
+                       help="Don't use business keys as insert IDs for duplicate removal")
     parser.add_argument("--dry-run", action="store_true",
                        help="Simulate upload without actually inserting data")
     parser.add_argument("--force", action="store_true",
@@ -347,11 +437,7 @@ def main():
             sys.exit(1)
         
         config = Config()
-        uploader = FirstCardUploader(config)
-        
-        # For automated runs, override prompt behavior
-        if args.force:
-            uploader.prompt_continue = lambda msg: True
+        uploader = FirstCardUploader(config, force=args.force)
         
         uploaded_count = uploader.upload_staging_file(
             staging_file=staging_file,
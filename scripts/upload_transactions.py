@@ -6,53 +6,254 @@ This script uploads transaction data from Excel files to BigQuery, handling
 deduplication, error recovery, and all supported bank formats.
 
 Usage:
-    python scripts/upload_transactions.py [file_path] [--bank BANK] [--dry-run]
+    python scripts/upload_transactions.py [file_path] [--bank BANK] [--dry-run] [--bulk] [--no-cache]
     
 Examples:
     python scripts/upload_transactions.py data/seb.xlsx --bank seb
     python scripts/upload_transactions.py data/revolut_new.xlsx --bank revolut --dry-run
     python scripts/upload_transactions.py data/ --bank all  # Process all files in directory
+    python scripts/upload_transactions.py data/ --bank all --bulk  # Load jobs instead of streaming
 """
 
 import os
 import sys
 import hashlib
+import io
+import json
+import struct
+import queue
+import threading
 import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import pandas as pd
 from google.cloud import bigquery
 import logging
 
+# orjson encodes load job NDJSON in native code; stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add src to path for imports
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 from budget_updater.config import Config
-from budget_updater.parsers import PARSER_REGISTRY
+from budget_updater.parsers import PARSER_REGISTRY, load_raw
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columns that must be set even though the tables declare them NULLABLE
+# (NULLABLE keeps later schema changes possible; the check lives here instead)
+RAW_REQUIRED_FIELDS = ("transaction_id", "source_bank", "file_hash",
+                       "parsed_date", "year_month", "parsed_description", "parsed_amount")
+LOG_REQUIRED_FIELDS = ("file_hash", "filename", "source_bank",
+                       "processed_timestamp", "processing_status")
+
+def _require_non_null(row: Dict, fields: Tuple[str, ...]) -> None:
+    """Raise ValueError if any of the given fields is missing or None in row."""
+    missing = [field for field in fields if row.get(field) is None]
+    if missing:
+        raise ValueError(f"Missing required fields {missing} in row: {row}")
+
+# Original export columns and the raw payload keys they map to, per bank
+RAW_COLUMN_MAPPINGS = {
+    'seb': {
+        'Bokföringsdatum': 'seb_bokforingsdatum',
+        'Valutadatum': 'seb_valutadatum',
+        'Verifikationsnummer': 'seb_verifikationsnummer',
+        'Text': 'seb_text',
+        'Belopp': 'seb_belopp',
+        'Saldo': 'seb_saldo'
+    },
+    'revolut': {
+        'Type': 'revolut_type',
+        'Product': 'revolut_product',
+        'Started Date': 'revolut_started_date',
+        'Completed Date': 'revolut_completed_date',
+        'Description': 'revolut_description',
+        'Amount': 'revolut_amount',
+        'Fee': 'revolut_fee',
+        'Currency': 'revolut_currency',
+        'State': 'revolut_state',
+        'Balance': 'revolut_balance'
+    },
+    'firstcard': {
+        'Datum': 'firstcard_datum',
+        'Ytterligare information': 'firstcard_ytterligare_info',
+        'Reseinformation / Inköpsplats': 'firstcard_reseinformation',
+        'Valuta': 'firstcard_valuta',
+        'växlingskurs': 'firstcard_vaxlingskurs',
+        'Utländskt belopp': 'firstcard_utlandskt_belopp',
+        'Belopp': 'firstcard_belopp',
+        'Moms': 'firstcard_moms',
+        'Kort': 'firstcard_kort'
+    },
+    'strawberry': {
+        'Datum': 'strawberry_datum',
+        'Bokfört': 'strawberry_bokfort',
+        'Specifikation': 'strawberry_specifikation',
+        'Ort': 'strawberry_ort',
+        'Valuta': 'strawberry_valuta',
+        'Utl.belopp/moms': 'strawberry_utl_belopp_moms',
+        'Belopp': 'strawberry_belopp'
+    }
+}
+
+# Smallest file sent through a load job with --bulk; smaller files are streamed
+# (load jobs are capped at 1500 per table per day)
+LOAD_JOB_MIN_ROWS = 500
+
+# Rows per streaming insert request (BigQuery recommends ~500, caps at 50,000)
+# and how many requests are in flight at once
+STREAMING_CHUNK_SIZE = 500
+STREAMING_WORKERS = 8
+# Prepared chunks waiting for an insert; bounds memory when preparing outpaces uploading
+STREAMING_QUEUE_SIZE = 4
+
+# A 16-byte transaction ID digest split into (transaction_id, transaction_id_hi)
+_TRANSACTION_ID_STRUCT = struct.Struct(">qq")
+
+# Raw payload columns holding dates and monetary values, by column-name suffix
+RAW_DATE_SUFFIXES = ("_datum", "_date", "_bokfort")
+RAW_AMOUNT_SUFFIXES = ("_belopp", "_amount", "_fee", "_balance", "_saldo", "_moms", "_vaxlingskurs")
+
+def _format_numeric(value) -> str:
+    """Format an amount as an exact decimal string for a NUMERIC(18, 4) column."""
+    return f"{Decimal(str(value)).quantize(Decimal('0.0001'))}"
+
+def _raw_payload_value(col_name: str, value):
+    """Convert a bank-native cell to its JSON payload representation."""
+    if pd.isna(value):
+        return None
+    try:
+        if col_name.endswith(RAW_DATE_SUFFIXES):
+            # Pre-parse to an ISO date so the value casts cleanly to DATE
+            return pd.Timestamp(value).date().isoformat()
+        if col_name.endswith(RAW_AMOUNT_SUFFIXES):
+            return _format_numeric(value)
+        if col_name.endswith('_nummer') or col_name.endswith('_size_bytes'):
+            return int(value)
+    except (ValueError, TypeError, ArithmeticError):
+        pass
+    return str(value)
+
+# Read size when hashing files without hashlib.file_digest
+FILE_HASH_READ_SIZE = 1 << 20
+
+# Hashes of files known to be uploaded successfully, persisted between runs
+# in one file per project and dataset
+FILE_HASH_CACHE_DIR = Path.home() / ".cache" / "budget_updater"
+
+def file_hash_cache_path(config: Config) -> Path:
+    """Path of the hash cache for the config's BigQuery project and dataset."""
+    return FILE_HASH_CACHE_DIR / f"processed_file_hashes.{config.gcp_project_id}.{config.bigquery_dataset_id}.txt"
+
+class FileHashCache:
+    """
+    Local record of successfully processed file hashes.
+    
+    Only confirmed uploads are cached, so a hit can skip the remote
+    file_processing_log lookup while a miss still has to ask BigQuery.
+    With persist=False new hashes are kept in memory only, for worker
+    processes whose parent owns the file. Without a path nothing is read
+    or written, so every file is checked against BigQuery.
+    """
+    
+    def __init__(self, path: Optional[Path], persist: bool = True):
+        self.path = path
+        self.persist = persist and path is not None
+        self.seen = set()
+        if path is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.seen.update(line.strip() for line in f if line.strip())
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not read file hash cache {self.path}: {e}")
+    
+    def __contains__(self, file_hash: str) -> bool:
+        return file_hash in self.seen
+    
+    def add(self, file_hash: str):
+        """Remember a processed file hash for this run and later ones."""
+        if file_hash in self.seen:
+            return
+        self.seen.add(file_hash)
+        if not self.persist:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(file_hash + "\n")
+        except OSError as e:
+            logger.warning(f"Could not update file hash cache {self.path}: {e}")
+
 class TransactionUploader:
     """Handles uploading transaction data to BigQuery with deduplication and error handling."""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, bulk: bool = False, chunk_size: int = STREAMING_CHUNK_SIZE,
+                 processed_hashes: Optional[set] = None, hash_cache: Optional[FileHashCache] = None):
         self.config = config
+        self.bulk = bulk
+        self.chunk_size = chunk_size
         self.client = bigquery.Client(project=config.gcp_project_id)
         self.dataset_id = config.bigquery_dataset_id
-        self.table_id = "raw_transactions"
+        self.table_id_template = "raw_{source_bank}"  # One raw table per bank
         self.log_table_id = "file_processing_log"
+        self.log_table_ref = self.client.dataset(self.dataset_id).table(self.log_table_id)
+        # Raw tables with their schema, fetched at most once per bank
+        self._raw_tables = {}
+        self.hash_cache = hash_cache if hash_cache is not None else FileHashCache(file_hash_cache_path(config))
+        # Successful file hashes fetched in bulk by prefetch_processed_hashes
+        self._processed_hashes = processed_hashes
         
     def calculate_file_hash(self, file_path: Path) -> str:
         """Calculate SHA256 hash of file content for deduplication."""
-        sha256_hash = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            if hasattr(hashlib, "file_digest"):  # Python 3.11+
+                return hashlib.file_digest(f, "sha256").hexdigest()
+            sha256_hash = hashlib.sha256()
+            for chunk in iter(lambda: f.read(FILE_HASH_READ_SIZE), b""):
                 sha256_hash.update(chunk)
         return sha256_hash.hexdigest()
     
+    def prefetch_processed_hashes(self) -> Optional[set]:
+        """
+        Fetch every successfully processed file hash with one query.
+        
+        Afterwards check_file_already_processed answers from memory instead of
+        querying per file; if the fetch fails it returns None and keeps using
+        point queries.
+        """
+        query = f"""
+        SELECT DISTINCT file_hash
+        FROM `{self.config.gcp_project_id}.{self.dataset_id}.{self.log_table_id}`
+        WHERE processing_status = 'SUCCESS'
+        """
+        
+        try:
+            self._processed_hashes = {row.file_hash for row in self.client.query(query).result()}
+            logger.info(f"🔍 Found {len(self._processed_hashes)} previously processed files")
+        except Exception as e:
+            logger.warning(f"Could not prefetch processed file hashes: {e}")
+            self._processed_hashes = None
+        return self._processed_hashes
+    
     def check_file_already_processed(self, file_hash: str) -> bool:
         """Check if file has already been processed successfully."""
+        if file_hash in self.hash_cache:
+            return True
+        
+        if self._processed_hashes is not None:
+            return file_hash in self._processed_hashes
+        
         query = f"""
         SELECT COUNT(*) as count
         FROM `{self.config.gcp_project_id}.{self.dataset_id}.{self.log_table_id}`
@@ -69,7 +270,10 @@ class TransactionUploader:
         try:
             results = self.client.query(query, job_config=job_config)
             for row in results:
-                return row.count > 0
+                if row.count > 0:
+                    self.hash_cache.add(file_hash)
+                    return True
+                return False
         except Exception as e:
             logger.warning(f"Could not check file processing status: {e}")
             return False
@@ -85,141 +289,204 @@ class TransactionUploader:
             "filename": file_path.name,
             "source_bank": source_bank,
             "file_size_bytes": file_path.stat().st_size,
-            "processed_timestamp": datetime.now(timezone.utc),
+            "processed_timestamp": datetime.now(timezone.utc).isoformat(),
             "records_processed": records_processed,
             "processing_status": status,
             "error_message": error_message
         }
         
-        table_ref = self.client.dataset(self.dataset_id).table(self.log_table_id)
-        
         try:
-            errors = self.client.insert_rows_json(table_ref, [log_data])
+            _require_non_null(log_data, LOG_REQUIRED_FIELDS)
+            errors = self.client.insert_rows_json(self.log_table_ref, [log_data])
             if errors:
                 logger.error(f"Failed to log processing status: {errors}")
+            elif status == "SUCCESS":
+                self.hash_cache.add(file_hash)
         except Exception as e:
             logger.error(f"Failed to log processing status: {e}")
     
-    def map_raw_columns(self, df: pd.DataFrame, source_bank: str) -> Dict:
+    def map_raw_columns(self, df: pd.DataFrame, source_bank: str) -> pd.DataFrame:
         """Map original DataFrame columns to BigQuery raw columns based on bank source."""
+        mapping = RAW_COLUMN_MAPPINGS.get(source_bank, {})
+        return df[[col for col in df.columns if col in mapping]].rename(columns=mapping)
+    
+    def create_transaction_ids(self, source_bank: str, file_hash: str,
+                               parsed_df: pd.DataFrame) -> List[Tuple[int, int]]:
+        """
+        Create unique transaction IDs for every parsed row based on source data.
         
-        # Get the original column names from the DataFrame
-        original_columns = df.columns.tolist()
+        Each ID is a BLAKE2b-128 digest of the row's source fields split into two
+        signed INT64 values (transaction_id, transaction_id_hi).
+        """
+        id_strings = (
+            f"{source_bank}_{file_hash}_" + parsed_df.index.to_series().astype(str)
+            + "_" + parsed_df['ParsedDate'].map(str)
+            + "_" + parsed_df['ParsedDescription'].astype(str)
+            + "_" + parsed_df['ParsedAmount'].map(str)
+        )
+        blake2b = hashlib.blake2b
+        unpack = _TRANSACTION_ID_STRUCT.unpack
+        return [unpack(blake2b(id_string.encode(), digest_size=16).digest()) for id_string in id_strings]
+    
+    def prepare_bigquery_data(self, parsed_df: pd.DataFrame, original_df: pd.DataFrame, 
+                            source_bank: str, file_path: Path, file_hash: str,
+                            raw_df: Optional[pd.DataFrame] = None) -> List[Dict]:
+        """
+        Prepare data for BigQuery insertion.
         
-        # Bank-specific column mappings
-        column_mappings = {
-            'seb': {
-                'Bokföringsdatum': 'seb_bokforingsdatum',
-                'Valutadatum': 'seb_valutadatum', 
-                'Verifikationsnummer': 'seb_verifikationsnummer',
-                'Text': 'seb_text',
-                'Belopp': 'seb_belopp',
-                'Saldo': 'seb_saldo'
-            },
-            'revolut': {
-                'Type': 'revolut_type',
-                'Product': 'revolut_product',
-                'Started Date': 'revolut_started_date',
-                'Completed Date': 'revolut_completed_date',
-                'Description': 'revolut_description',
-                'Amount': 'revolut_amount',
-                'Fee': 'revolut_fee',
-                'Currency': 'revolut_currency',
-                'State': 'revolut_state',
-                'Balance': 'revolut_balance'
-            },
-            'firstcard': {
-                'Datum': 'firstcard_datum',
-                'Ytterligare information': 'firstcard_ytterligare_info',
-                'Reseinformation / Inköpsplats': 'firstcard_reseinformation',
-                'Valuta': 'firstcard_valuta',
-                'växlingskurs': 'firstcard_vaxlingskurs',
-                'Utländskt belopp': 'firstcard_utlandskt_belopp',
-                'Belopp': 'firstcard_belopp',
-                'Moms': 'firstcard_moms',
-                'Kort': 'firstcard_kort'
-            },
-            'strawberry': {
-                'Datum': 'strawberry_datum',
-                'Bokfört': 'strawberry_bokfort',
-                'Specifikation': 'strawberry_specifikation',
-                'Ort': 'strawberry_ort',
-                'Valuta': 'strawberry_valuta',
-                'Utl.belopp/moms': 'strawberry_utl_belopp_moms',
-                'Belopp': 'strawberry_belopp'
-            }
-        }
+        raw_df is original_df's mapped raw columns aligned on parsed_df's index; it
+        is computed from original_df when not given. raw_payload is left as a dict
+        so a load job writes it as a JSON object; streaming inserts need it
+        serialized (see _iter_record_chunks).
+        """
         
-        mapping = column_mappings.get(source_bank, {})
+        dates = parsed_df['ParsedDate']
+        has_date = dates.notna()
+        amounts = parsed_df['ParsedAmount']
+        transaction_ids = self.create_transaction_ids(source_bank, file_hash, parsed_df)
         
-        # Create result dict with all raw columns as None
-        result = {}
+        records = pd.DataFrame({
+            "transaction_id": [ids[0] for ids in transaction_ids],
+            "transaction_id_hi": [ids[1] for ids in transaction_ids],
+            "source_bank": source_bank,
+            "file_hash": file_hash,
+            "parsed_date": dates.dt.strftime('%Y-%m-%d').where(has_date, None),
+            # Partition bucket; BigQuery has no generated columns to derive it
+            "year_month": (dates.dt.year * 100 + dates.dt.month).astype(object).where(has_date, None),
+            "parsed_description": parsed_df['ParsedDescription'].astype(str),
+            "parsed_amount": amounts.map(_format_numeric, na_action='ignore').where(amounts.notna(), None),
+        }, index=parsed_df.index)
         
-        # Add the mapped columns
-        for original_col in original_columns:
-            if original_col in mapping:
-                bigquery_col = mapping[original_col]
-                result[bigquery_col] = df[original_col].tolist()
+        # Collect raw columns for this specific bank into the JSON payload, aligned
+        # on the parsed rows' original positions
+        if raw_df is None:
+            raw_df = self.map_raw_columns(original_df, source_bank).reindex(parsed_df.index)
+        # Plain lists, as pandas would turn the converted Nones back into NaN
+        raw_values = [[_raw_payload_value(col_name, value) for value in raw_df[col_name]]
+                      for col_name in raw_df.columns]
+        raw_payloads = ([dict(zip(raw_df.columns, row_values)) for row_values in zip(*raw_values)]
+                        if raw_values else [{}] * len(raw_df))
+        records["raw_payload"] = raw_payloads
         
-        return result
+        return records.to_dict(orient="records")
     
-    def create_transaction_id(self, source_bank: str, file_hash: str, row_index: int, 
-                            parsed_date: str, parsed_description: str, parsed_amount: float) -> str:
-        """Create unique transaction ID based on source data."""
-        id_string = f"{source_bank}_{file_hash}_{row_index}_{parsed_date}_{parsed_description}_{parsed_amount}"
-        return hashlib.md5(id_string.encode()).hexdigest()
+    def get_raw_table(self, source_bank: str) -> bigquery.Table:
+        """Return the bank's raw table, with schema, fetching it only on first use."""
+        if source_bank not in self._raw_tables:
+            table_id = self.table_id_template.format(source_bank=source_bank)
+            self._raw_tables[source_bank] = self.client.get_table(self.client.dataset(self.dataset_id).table(table_id))
+        return self._raw_tables[source_bank]
     
-    def prepare_bigquery_data(self, parsed_df: pd.DataFrame, original_df: pd.DataFrame, 
-                            source_bank: str, file_path: Path, file_hash: str) -> List[Dict]:
-        """Prepare data for BigQuery insertion."""
+    def _upload_via_load_job(self, table: bigquery.Table, bigquery_data: List[Dict]) -> List:
+        """Append records to a raw table with a single load job, returning its errors."""
+        job_config = bigquery.LoadJobConfig(
+            schema=table.schema,
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+        )
         
-        raw_columns = self.map_raw_columns(original_df, source_bank)
-        bigquery_rows = []
+        buffer = io.BytesIO()
+        for record in bigquery_data:
+            buffer.write(orjson.dumps(record) if orjson else json.dumps(record).encode())
+            buffer.write(b"\n")
+        buffer.seek(0)
         
-        upload_timestamp = datetime.now(timezone.utc)
+        job = self.client.load_table_from_file(buffer, table, job_config=job_config)
+        job.result()
+        return job.errors or []
+    
+    def _iter_record_chunks(self, parsed_df: pd.DataFrame, original_df: pd.DataFrame,
+                            source_bank: str, file_path: Path, file_hash: str) -> Iterator[List[Dict]]:
+        """
+        Prepare and validate records for streaming, chunk_size parsed rows at a time.
         
-        for i, row in parsed_df.iterrows():
-            # Create base record with standardized columns
-            record = {
-                "transaction_id": self.create_transaction_id(
-                    source_bank, file_hash, i,
-                    str(row['ParsedDate']), row['ParsedDescription'], row['ParsedAmount']
-                ),
-                "source_bank": source_bank,
-                "source_file": file_path.name,
-                "upload_timestamp": upload_timestamp,
-                "file_hash": file_hash,
-                "parsed_date": row['ParsedDate'].date() if pd.notna(row['ParsedDate']) else None,
-                "parsed_description": str(row['ParsedDescription']),
-                "parsed_amount": float(row['ParsedAmount']) if pd.notna(row['ParsedAmount']) else None,
-            }
-            
-            # Add raw columns for this specific bank
-            for col_name, col_values in raw_columns.items():
-                if i < len(col_values):
-                    value = col_values[i]
-                    # Convert to appropriate type
-                    if pd.isna(value):
-                        record[col_name] = None
-                    elif col_name.endswith('_datum') or col_name.endswith('_date'):
-                        record[col_name] = str(value)
-                    elif 'belopp' in col_name or 'amount' in col_name or col_name.endswith('_fee') or col_name.endswith('_balance'):
-                        record[col_name] = float(value) if pd.notna(value) else None
-                    elif col_name.endswith('_nummer') or col_name.endswith('_size_bytes'):
-                        record[col_name] = int(value) if pd.notna(value) else None
-                    else:
-                        record[col_name] = str(value)
-                else:
-                    record[col_name] = None
-            
-            bigquery_rows.append(record)
+        insertAll takes JSON column values as strings, so raw_payload is serialized here.
+        """
+        # Map the raw columns once per file and slice them with the parsed rows
+        raw_df = self.map_raw_columns(original_df, source_bank).reindex(parsed_df.index)
+        for start in range(0, len(parsed_df), self.chunk_size):
+            end = start + self.chunk_size
+            records = self.prepare_bigquery_data(
+                parsed_df.iloc[start:end], original_df, source_bank, file_path, file_hash,
+                raw_df=raw_df.iloc[start:end]
+            )
+            for record in records:
+                _require_non_null(record, RAW_REQUIRED_FIELDS)
+                record["raw_payload"] = json.dumps(record["raw_payload"], ensure_ascii=False)
+            yield records
+    
+    def _insert_rows(self, table: bigquery.Table, rows: List[Dict]) -> List:
+        """
+        Stream rows into a table, returning BigQuery's insert errors.
+        
+        Each row's insertId is derived from its deterministic transaction ID, so
+        re-sending rows of a partly uploaded file lets BigQuery drop the repeats.
+        """
+        row_ids = [f"{row['transaction_id']}_{row['transaction_id_hi']}" for row in rows]
+        return self.client.insert_rows_json(table, rows, row_ids=row_ids)
+    
+    def _upload_via_streaming(self, table: bigquery.Table, record_chunks: Iterable[List[Dict]], chunk_count: int) -> List:
+        """
+        Stream record chunks as they are prepared, several requests in flight,
+        returning the insert errors.
+        
+        A producer thread fills a bounded queue while the insert threads drain
+        it, so preparing chunk N+1 overlaps uploading chunk N. The first rejected
+        chunk or exception stops preparing and sending the remaining chunks.
+        """
+        workers = min(STREAMING_WORKERS, chunk_count)
+        chunk_queue = queue.Queue(maxsize=STREAMING_QUEUE_SIZE)
+        stop = threading.Event()
+        failures = []
+        
+        def produce():
+            try:
+                for chunk in record_chunks:
+                    if stop.is_set():
+                        break
+                    chunk_queue.put(chunk)
+            except Exception as e:
+                failures.append(e)
+                stop.set()
+            finally:
+                for _ in range(workers):
+                    chunk_queue.put(None)
+        
+        def consume() -> List:
+            errors = []
+            while (chunk := chunk_queue.get()) is not None:
+                # Keep draining after a failure so the producer never blocks
+                if stop.is_set():
+                    continue
+                try:
+                    chunk_errors = self._insert_rows(table, chunk)
+                except Exception as e:
+                    failures.append(e)
+                    stop.set()
+                    continue
+                if chunk_errors:
+                    errors.extend(chunk_errors)
+                    stop.set()
+            return errors
+        
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = [executor.submit(consume) for _ in range(workers)]
+            errors = [error for result in results for error in result.result()]
+        producer.join()
         
-        return bigquery_rows
+        if failures:
+            raise failures[0]
+        return errors
     
-    def upload_file(self, file_path: Path, source_bank: str, dry_run: bool = False) -> Tuple[bool, int, str]:
+    def upload_file(self, file_path: Path, source_bank: str, dry_run: bool = False,
+                    file_hash: Optional[str] = None) -> Tuple[bool, int, str]:
         """
         Upload a single file to BigQuery.
         
+        The file hash is calculated here unless the caller already has it.
+        
         Returns:
             (success: bool, records_processed: int, error_message: str)
         """
@@ -227,7 +494,8 @@ class TransactionUploader:
             logger.info(f"📁 Processing {file_path} as {source_bank}")
             
             # Calculate file hash for deduplication
-            file_hash = self.calculate_file_hash(file_path)
+            if file_hash is None:
+                file_hash = self.calculate_file_hash(file_path)
             
             # Check if already processed
             if self.check_file_already_processed(file_hash):
@@ -240,12 +508,12 @@ class TransactionUploader:
                 logger.error(error_msg)
                 return False, 0, error_msg
             
-            # Read original file for raw columns
-            original_df = pd.read_excel(file_path)
+            # Read original file once, as the parser would, for raw columns and the parser
+            original_df = load_raw(source_bank, file_path)
             
             # Parse using our standardized parser
             parser_func = PARSER_REGISTRY[source_bank]
-            parsed_df = parser_func(file_path)
+            parsed_df = parser_func(file_path, raw_df=original_df)
             
             if parsed_df is None or len(parsed_df) == 0:
                 error_msg = f"Failed to parse file or no data found"
@@ -254,12 +522,10 @@ class TransactionUploader:
             
             logger.info(f"📊 Parsed {len(parsed_df)} transactions")
             
-            # Prepare data for BigQuery
-            bigquery_data = self.prepare_bigquery_data(
-                parsed_df, original_df, source_bank, file_path, file_hash
-            )
-            
             if dry_run:
+                bigquery_data = self.prepare_bigquery_data(
+                    parsed_df, original_df, source_bank, file_path, file_hash
+                )
                 logger.info(f"🏃‍♂️ DRY RUN: Would upload {len(bigquery_data)} records")
                 logger.info("Sample record:")
                 if bigquery_data:
@@ -269,10 +535,23 @@ class TransactionUploader:
                 return True, len(bigquery_data), "Dry run successful"
             
             # Upload to BigQuery
-            table_ref = self.client.dataset(self.dataset_id).table(self.table_id)
+            table = self.get_raw_table(source_bank)
+            record_count = len(parsed_df)
             
-            logger.info(f"⬆️  Uploading {len(bigquery_data)} records to BigQuery...")
-            errors = self.client.insert_rows_json(table_ref, bigquery_data)
+            if self.bulk and record_count >= LOAD_JOB_MIN_ROWS:
+                bigquery_data = self.prepare_bigquery_data(
+                    parsed_df, original_df, source_bank, file_path, file_hash
+                )
+                for record in bigquery_data:
+                    _require_non_null(record, RAW_REQUIRED_FIELDS)
+                
+                logger.info(f"⬆️  Loading {record_count} records to BigQuery with a load job...")
+                errors = self._upload_via_load_job(table, bigquery_data)
+            else:
+                logger.info(f"⬆️  Uploading {record_count} records to BigQuery...")
+                record_chunks = self._iter_record_chunks(parsed_df, original_df, source_bank, file_path, file_hash)
+                chunk_count = -(-record_count // self.chunk_size)
+                errors = self._upload_via_streaming(table, record_chunks, chunk_count)
             
             if errors:
                 error_msg = f"BigQuery insertion errors: {errors}"
@@ -281,10 +560,10 @@ class TransactionUploader:
                 return False, 0, error_msg
             
             # Log successful processing
-            self.log_file_processing(file_path, source_bank, file_hash, len(bigquery_data), "SUCCESS")
+            self.log_file_processing(file_path, source_bank, file_hash, record_count, "SUCCESS")
             
-            logger.info(f"✅ Successfully uploaded {len(bigquery_data)} transactions")
-            return True, len(bigquery_data), None
+            logger.info(f"✅ Successfully uploaded {record_count} transactions")
+            return True, record_count, None
             
         except Exception as e:
             error_msg = f"Upload failed: {str(e)}"
@@ -295,17 +574,44 @@ class TransactionUploader:
                 pass  # Don't fail if logging fails
             return False, 0, error_msg
 
+# Filename keywords and the bank they identify; earlier entries win when several match
+BANK_FILENAME_KEYWORDS = (
+    ('seb', 'seb'),
+    ('revolut', 'revolut'),
+    ('firstcard', 'firstcard'),
+    ('first', 'firstcard'),
+    ('strawberry', 'strawberry'),
+)
+
+# Per-process uploader for directory mode; bigquery.Client must not cross a fork
+_worker_uploader = None
+
+def _init_upload_worker(bulk: bool, chunk_size: int, processed_hashes: Optional[set],
+                        hash_cache_path: Optional[Path]):
+    """Create this worker process's own TransactionUploader."""
+    global _worker_uploader
+    # The parent process writes the hash cache file from the hashes workers return
+    _worker_uploader = TransactionUploader(Config(), bulk=bulk, chunk_size=chunk_size,
+                                           processed_hashes=processed_hashes,
+                                           hash_cache=FileHashCache(hash_cache_path, persist=False))
+
+def _upload_in_worker(file_path: Path, source_bank: str, dry_run: bool,
+                      file_hash: str) -> Tuple[bool, int, str, Optional[str]]:
+    """
+    Upload one file with the worker process's uploader.
+    
+    Also returns the file hash if it is now known to be processed, for the
+    parent to cache.
+    """
+    success, records, error = _worker_uploader.upload_file(file_path, source_bank, dry_run, file_hash)
+    return success, records, error, file_hash if file_hash in _worker_uploader.hash_cache else None
+
 def detect_bank_from_filename(filename: str) -> Optional[str]:
     """Detect bank source from filename."""
     filename_lower = filename.lower()
-    if 'seb' in filename_lower:
-        return 'seb'
-    elif 'revolut' in filename_lower:
-        return 'revolut'
-    elif 'firstcard' in filename_lower or 'first' in filename_lower:
-        return 'firstcard'
-    elif 'strawberry' in filename_lower:
-        return 'strawberry'
+    for keyword, bank in BANK_FILENAME_KEYWORDS:
+        if keyword in filename_lower:
+            return bank
     return None
 
 def main():
@@ -315,12 +621,20 @@ def main():
                        help="Bank source (required for single file, optional for directory)")
     parser.add_argument("--dry-run", action="store_true", 
                        help="Show what would be uploaded without actually uploading")
+    parser.add_argument("--bulk", action="store_true",
+                       help=f"Use load jobs instead of streaming inserts for files with at least {LOAD_JOB_MIN_ROWS} rows")
+    parser.add_argument("--chunk-size", type=int, default=STREAMING_CHUNK_SIZE,
+                       help=f"Rows per streaming insert request (default: {STREAMING_CHUNK_SIZE})")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Ignore the local processed-file hash cache and check every file against BigQuery")
     
     args = parser.parse_args()
     
     try:
         config = Config()
-        uploader = TransactionUploader(config)
+        hash_cache = FileHashCache(None) if args.no_cache else None
+        uploader = TransactionUploader(config, bulk=args.bulk, chunk_size=args.chunk_size,
+                                       hash_cache=hash_cache)
         
         path = Path(args.path)
         
@@ -350,22 +664,47 @@ def main():
                 logger.error(f"❌ No Excel files found in {path}")
                 sys.exit(1)
             
+            processed_hashes = uploader.prefetch_processed_hashes()
+            
             total_records = 0
             successful_files = 0
             
+            file_banks = []
             for file_path in excel_files:
                 bank = args.bank if args.bank != 'all' else detect_bank_from_filename(file_path.name)
                 
                 if not bank:
                     logger.warning(f"⚠️  Skipping {file_path.name}: Could not detect bank")
                     continue
-                
-                success, records, error = uploader.upload_file(file_path, bank, args.dry_run)
-                if success:
-                    total_records += records
-                    successful_files += 1
-                else:
-                    logger.error(f"❌ Failed to upload {file_path.name}: {error}")
+                file_banks.append((file_path, bank))
+            
+            # Submit one file per content hash so identical copies never upload twice
+            files_by_hash = {}
+            for file_path, bank in file_banks:
+                file_hash = uploader.calculate_file_hash(file_path)
+                if file_hash in files_by_hash:
+                    logger.info(f"⏭️  Skipping {file_path.name}: same content as {files_by_hash[file_hash][0].name}")
+                    continue
+                files_by_hash[file_hash] = (file_path, bank)
+            
+            # Files are independent, so parse and upload them in parallel processes
+            if files_by_hash:
+                with ProcessPoolExecutor(
+                    max_workers=min(os.cpu_count() or 1, len(files_by_hash)),
+                    initializer=_init_upload_worker,
+                    initargs=(args.bulk, args.chunk_size, processed_hashes, uploader.hash_cache.path)
+                ) as executor:
+                    futures = [(file_path, executor.submit(_upload_in_worker, file_path, bank, args.dry_run, file_hash))
+                               for file_hash, (file_path, bank) in files_by_hash.items()]
+                    for file_path, future in futures:
+                        success, records, error, processed_hash = future.result()
+                        if processed_hash:
+                            uploader.hash_cache.add(processed_hash)
+                        if success:
+                            total_records += records
+                            successful_files += 1
+                        else:
+                            logger.error(f"❌ Failed to upload {file_path.name}: {error}")
             
             logger.info(f"🎉 Batch upload completed: {successful_files} files, {total_records} total records")
         
@@ -1,6 +1,7 @@
 import logging
 from pathlib import Path
 import pandas as pd
+from packaging.version import Version
 from typing import Optional, Dict, Callable, Any, List
 
 # ---vvv--- REMOVE PARSER REGISTRY FROM HERE ---vvv---
@@ -20,6 +21,37 @@ from typing import Optional, Dict, Callable, Any, List
 
 logger = logging.getLogger(__name__)
 
+try:
+    import python_calamine  # noqa: F401
+except ImportError:
+    python_calamine = None
+
+# Rust-backed xlsx/xls reader used when installed (pandas >= 2.2 knows it as 'calamine');
+# None leaves the engine choice to each parser's default
+FAST_EXCEL_ENGINE = (
+    'calamine' if python_calamine and Version(pd.__version__).release >= (2, 2) else None
+)
+
+# read_excel settings of each bank's parser, shared with load_raw so a file read
+# up front is the same frame the parser would have read itself
+READ_EXCEL_OPTIONS: Dict[str, Dict[str, Any]] = {
+    'seb': {'engine': 'openpyxl', 'sheet_name': 'Sheet1'},
+    'strawberry': {'engine': None},  # Let pandas/xlrd decide
+    'firstcard': {'engine': None},  # Let pandas decide
+    'revolut': {'engine': 'openpyxl'},
+}
+
+def read_excel_options(bank: str) -> Dict[str, Any]:
+    """Return the engine and sheet_name a bank's parser passes to parse_excel_generic."""
+    options = {'engine': None, 'sheet_name': None, **READ_EXCEL_OPTIONS[bank]}
+    options['engine'] = FAST_EXCEL_ENGINE or options['engine']
+    return options
+
+def load_raw(bank: str, file_path: str | Path) -> pd.DataFrame:
+    """Read a bank export the way that bank's parser does, for reuse as its raw_df."""
+    read_excel_kwargs = {key: value for key, value in read_excel_options(bank).items() if value}
+    return pd.read_excel(file_path, **read_excel_kwargs)
+
 def parse_excel_generic(
     file_path: str | Path,
     *,
@@ -29,6 +61,7 @@ def parse_excel_generic(
     date_type: str = 'string',  # 'string' or 'excel_serial'
     date_origin: str = '1899-12-30',
     required_columns: List[str] = None,
+    raw_df: Optional[pd.DataFrame] = None,
 ) -> pd.DataFrame | None:
     """
     Generic Excel parser for bank/card exports.
@@ -40,6 +73,8 @@ def parse_excel_generic(
         date_type: 'string' for normal date parsing, 'excel_serial' for Excel serial dates
         date_origin: Origin for Excel serial dates
         required_columns: List of logical names that must be present (default: ['date', 'desc', 'amount'])
+        raw_df: Contents of file_path already read with the same engine and sheet_name;
+            skips reading the file again (optional)
     Returns:
         DataFrame with columns: ParsedDate, ParsedDescription, ParsedAmount, or None on error.
     """
@@ -51,11 +86,14 @@ def parse_excel_generic(
             read_excel_kwargs['engine'] = engine
         if sheet_name:
             read_excel_kwargs['sheet_name'] = sheet_name
-        try:
-            df = pd.read_excel(file_path, **read_excel_kwargs)
-        except Exception as e:
-            logger.error(f"read_excel failed for {file_path} with args {read_excel_kwargs}: {e}")
-            return None
+        if raw_df is not None:
+            df = raw_df
+        else:
+            try:
+                df = pd.read_excel(file_path, **read_excel_kwargs)
+            except Exception as e:
+                logger.error(f"read_excel failed for {file_path} with args {read_excel_kwargs}: {e}")
+                return None
         logger.debug(f"Loaded dataframe with columns: {df.columns.tolist()}")
         # Find columns
         found_cols = {}
@@ -125,11 +163,11 @@ def parse_excel_generic(
         logger.exception(f"Unexpected error while parsing {file_path}: {e}")
         return None
 
-def parse_seb(file_path: str | Path) -> pd.DataFrame | None:
+def parse_seb(file_path: str | Path, raw_df: Optional[pd.DataFrame] = None) -> pd.DataFrame | None:
     return parse_excel_generic(
         file_path,
-        engine='openpyxl',
-        sheet_name='Sheet1',
+        raw_df=raw_df,
+        **read_excel_options('seb'),
         column_map={
             'date': ['Bokföringsdatum'],
             'desc': ['Text'],
@@ -138,10 +176,11 @@ def parse_seb(file_path: str | Path) -> pd.DataFrame | None:
         date_type='string',
     )
 
-def parse_strawberry(file_path: str | Path) -> pd.DataFrame | None:
+def parse_strawberry(file_path: str | Path, raw_df: Optional[pd.DataFrame] = None) -> pd.DataFrame | None:
     return parse_excel_generic(
         file_path,
-        engine=None,  # Let pandas/xlrd decide
+        raw_df=raw_df,
+        **read_excel_options('strawberry'),
         column_map={
             'date': ['Bokfört'],
             'desc': ['Specifikation'],
@@ -151,10 +190,11 @@ def parse_strawberry(file_path: str | Path) -> pd.DataFrame | None:
         date_origin='1899-12-30',
     )
 
-def parse_firstcard(file_path: str | Path) -> pd.DataFrame | None:
+def parse_firstcard(file_path: str | Path, raw_df: Optional[pd.DataFrame] = None) -> pd.DataFrame | None:
     return parse_excel_generic(
         file_path,
-        engine=None,  # Let pandas decide
+        raw_df=raw_df,
+        **read_excel_options('firstcard'),
         column_map={
             'date': ['Datum'],
             'desc': ['Reseinformation / Inköpsplats', 'Reseinformation/Inköpsplats'],
@@ -163,7 +203,7 @@ def parse_firstcard(file_path: str | Path) -> pd.DataFrame | None:
         date_type='string',
     )
 
-def parse_revolut(file_path: str | Path) -> pd.DataFrame | None:
+def parse_revolut(file_path: str | Path, raw_df: Optional[pd.DataFrame] = None) -> pd.DataFrame | None:
     """
     Parses a Revolut export file (.xlsx assumed).
     Expected columns: 'Completed Date', 'Description', 'Amount', 'Fee'.
@@ -171,10 +211,19 @@ def parse_revolut(file_path: str | Path) -> pd.DataFrame | None:
     Fee should be added to OUTFLOW if present and non-zero.
     """
     try:
+        # Read once; the Fee column comes from the same frame as the basic data
+        if raw_df is None:
+            try:
+                raw_df = load_raw('revolut', file_path)
+            except Exception as e:
+                logger.error(f"read_excel failed for {file_path}: {e}")
+                return None
+
         # First, get the basic parsed data using the generic parser
         parsed_df = parse_excel_generic(
             file_path,
-            engine='openpyxl',
+            raw_df=raw_df,
+            **read_excel_options('revolut'),
             column_map={
                 'date': ['Completed Date'],
                 'desc': ['Description'],
@@ -191,10 +240,8 @@ def parse_revolut(file_path: str | Path) -> pd.DataFrame | None:
         file_path = Path(file_path)
         logger.info(f"Processing Revolut-specific Fee column for {file_path}")
         
-        # Re-read the file to get the Fee column
-        df = pd.read_excel(file_path, engine='openpyxl')
-        
         # Find the Fee column
+        df = raw_df
         fee_col = None
         for col in df.columns:
             normalized_col = str(col).strip().replace('\ufeff', '').lower()
@@ -238,7 +285,8 @@ def parse_revolut(file_path: str | Path) -> pd.DataFrame | None:
 
 # ---vvv--- ADD PARSER REGISTRY HERE (AT THE END) ---vvv---
 # Type hint for parser functions
-ParserFunction = Callable[[Path | str], Optional[pd.DataFrame]]
+# (file_path, raw_df=None); raw_df is the already loaded file, if any
+ParserFunction = Callable[..., Optional[pd.DataFrame]]
 
 PARSER_REGISTRY: Dict[str, ParserFunction] = {
     'seb': parse_seb,
@@ -9,11 +9,20 @@ import logging
 # This assumes tests are run from the project root
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from budget_updater.parsers import parse_seb
+from budget_updater import parsers
+from budget_updater.parsers import load_raw, parse_seb, parse_strawberry
 
 # Configure logging for tests (optional, but can be helpful)
 # logging.basicConfig(level=logging.DEBUG)
 
+@pytest.fixture(autouse=True, params=[None, 'calamine'], ids=['default-engine', 'calamine'])
+def excel_engine(request, monkeypatch):
+    """Runs every parser test with each parser's own engine and with calamine."""
+    if request.param == 'calamine' and parsers.python_calamine is None:
+        pytest.skip("python-calamine is not installed")
+    monkeypatch.setattr(parsers, 'FAST_EXCEL_ENGINE', request.param)
+    return request.param
+
 @pytest.fixture
 def seb_test_file(tmp_path: Path) -> Path:
     """Creates a dummy SEB Excel file for testing."""
@@ -88,4 +97,51 @@ def test_parse_seb_empty_file(seb_empty_file: Path):
     assert df is not None
     assert df.empty # Expecting an empty DataFrame
 
+def test_parse_seb_with_raw_df(seb_test_file: Path):
+    """Tests that a frame from load_raw parses the same as reading the file."""
+    expected = parse_seb(seb_test_file)
+    df = parse_seb(seb_test_file, raw_df=load_raw('seb', seb_test_file))
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_parse_seb_with_raw_df_skips_reading(seb_test_file: Path, tmp_path: Path):
+    """Tests that a given raw_df is used instead of reading the file."""
+    raw_df = load_raw('seb', seb_test_file)
+    df = parse_seb(tmp_path / "missing.xlsx", raw_df=raw_df)
+    assert df is not None
+    assert len(df) == 2
+
+def test_load_raw_uses_parser_sheet(tmp_path: Path):
+    """Tests that load_raw reads SEB's 'Sheet1' even when it is not the first sheet."""
+    file_path = tmp_path / "test_seb_two_sheets.xlsx"
+    with pd.ExcelWriter(file_path) as writer:
+        pd.DataFrame({"Other": [1]}).to_excel(writer, index=False, sheet_name='Summary')
+        pd.DataFrame({
+            "Bokföringsdatum": ["2024-01-15"],
+            "Text": ["Expense 1"],
+            "Belopp": [-100.50],
+        }).to_excel(writer, index=False, sheet_name='Sheet1')
+    raw_df = load_raw('seb', file_path)
+    assert list(raw_df.columns) == ["Bokföringsdatum", "Text", "Belopp"]
+    df = parse_seb(file_path, raw_df=raw_df)
+    assert len(df) == 1
+
+@pytest.fixture
+def strawberry_test_file(tmp_path: Path) -> Path:
+    """Creates a dummy Strawberry Excel file with Excel serial dates."""
+    data = {
+        "Bokfört": [45306, 45307.0, None],  # 2024-01-15, 2024-01-16
+        "Specifikation": ["Expense 1", "Refund 1", "Missing Date"],
+        "Belopp": [100.50, -20.00, 5.0],
+    }
+    file_path = tmp_path / "test_strawberry.xlsx"
+    pd.DataFrame(data).to_excel(file_path, index=False)
+    return file_path
+
+def test_parse_strawberry_excel_serial_dates(strawberry_test_file: Path):
+    """Tests that Excel serial dates decode to the same dates under every engine."""
+    df = parse_strawberry(strawberry_test_file)
+    assert df is not None
+    assert list(df['ParsedDate']) == [pd.Timestamp("2024-01-15"), pd.Timestamp("2024-01-16")]
+    assert list(df['ParsedAmount']) == [100.50, -20.00]
+
 # Add more tests for edge cases: different encodings, different separators if needed, etc. 
\ No newline at end of file
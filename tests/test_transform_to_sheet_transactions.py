@@ -0,0 +1,42 @@
+import os
+import re
+import importlib.util
+import pytest
+
+pytest.importorskip("google.cloud.bigquery")
+
+# scripts/ is not a package, so load the transform script by path
+_spec = importlib.util.spec_from_file_location(
+    "transform_to_sheet_transactions",
+    os.path.join(os.path.dirname(__file__), '../scripts/transform_to_sheet_transactions.py'),
+)
+transform = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(transform)
+
+PROJECT_ID = "test-project"
+DATASET_ID = "test_dataset"
+
+DEDUP_CLAUSE = re.compile(
+    r"QUALIFY ROW_NUMBER\(\) OVER \(PARTITION BY raw\.business_key ORDER BY raw\.upload_timestamp\) = 1"
+)
+
+
+@pytest.mark.parametrize("source_bank", sorted(transform.BANK_TRANSFORMS))
+def test_bank_transform_keeps_one_row_per_business_key(source_bank):
+    """Tests that repeated raw rows are reduced to one before the anti-join and insert."""
+    sql = transform._bank_transform_sql(PROJECT_ID, DATASET_ID, source_bank)
+
+    source_table = transform.BANK_TRANSFORMS[source_bank]['source_table']
+    dedup = DEDUP_CLAUSE.search(sql)
+    assert dedup is not None
+    # Inside the raw subquery, after reading the raw table and before the anti-join
+    assert sql.index(f"`{PROJECT_ID}.{DATASET_ID}.{source_table}` raw") < dedup.start()
+    assert dedup.start() < sql.index(") raw") < sql.index("LEFT JOIN")
+
+
+def test_all_banks_merge_dedupes_every_source():
+    """Tests that every raw table feeding the MERGE is reduced to one row per business_key."""
+    sql = transform._all_banks_merge_sql(PROJECT_ID, DATASET_ID)
+
+    assert len(DEDUP_CLAUSE.findall(sql)) == len(transform.BANK_TRANSFORMS)
+    assert "WHEN NOT MATCHED THEN" in sql
@@ -0,0 +1,210 @@
+import sys
+import os
+import json
+import hashlib
+import importlib.util
+import pandas as pd
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+
+# Add src directory to sys.path to allow importing budget_updater
+# This assumes tests are run from the project root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+pytest.importorskip("google.cloud.bigquery")
+
+from budget_updater.parsers import PARSER_REGISTRY
+
+# scripts/ is not a package, so load the upload script by path
+_spec = importlib.util.spec_from_file_location(
+    "upload_transactions",
+    os.path.join(os.path.dirname(__file__), '../scripts/upload_transactions.py'),
+)
+upload_transactions = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(upload_transactions)
+
+FILE_HASH = "0123456789abcdef" * 4
+
+# A few rows of each bank's export, including one row the parser drops
+BANK_EXPORTS = {
+    'seb': {
+        "Bokföringsdatum": ["2024-01-15", "2024-01-16", None, "2024-01-18"],
+        "Valutadatum": ["2024-01-14", "2024-01-16", "2024-01-17", "2024-01-18"],
+        "Verifikationsnummer": [5484381424, 5484381425, 5484381426, 5484381427],
+        "Text": ["ICA Maxi", "Lön", "Saknar datum", "SL \"Access\""],
+        "Belopp": [-100.5, 25000.0, -50.0, -43.0],
+        "Saldo": [1899.5, 26899.5, 26849.5, 26806.5],
+    },
+    'revolut': {
+        "Type": ["CARD_PAYMENT", "TOPUP", "CARD_PAYMENT"],
+        "Product": ["Current", "Current", "Current"],
+        "Started Date": ["2024-02-01 10:00:00", "2024-02-02 11:00:00", "2024-02-03 12:00:00"],
+        "Completed Date": ["2024-02-01 10:05:00", None, "2024-02-03 12:05:00"],
+        "Description": ["Café Åre", "Top-Up", "Amazon"],
+        "Amount": [-4.2, 100.0, -19.99],
+        "Fee": [0.0, 0.0, 0.5],
+        "Currency": ["EUR", "EUR", "EUR"],
+        "State": ["COMPLETED", "PENDING", "COMPLETED"],
+        "Balance": [95.8, None, 75.31],
+    },
+    'firstcard': {
+        "Datum": ["2024-03-01", "2024-03-02", "2024-03-03"],
+        "Ytterligare information": [None, "Resa", None],
+        "Reseinformation / Inköpsplats": ["Hotell Göteborg", "SJ", "Pressbyrån"],
+        "Valuta": ["SEK", "SEK", "SEK"],
+        "växlingskurs": [1.0, 1.0, 1.0],
+        "Utländskt belopp": [None, None, None],
+        "Belopp": [1250.0, 489.0, "abc"],
+        "Moms": [0.0, 29.34, 0.0],
+        "Kort": ["*1234", "*1234", "*1234"],
+    },
+    'strawberry': {
+        "Datum": ["2024-04-01", "2024-04-02", "2024-04-03"],
+        # Excel serial dates, as Strawberry exports them
+        "Bokfört": [45384, 45385, None],
+        "Specifikation": ["Netflix", "Spotify", "Apotek"],
+        "Ort": ["Stockholm", None, "Malmö"],
+        "Valuta": ["SEK", "SEK", "SEK"],
+        "Utl.belopp/moms": [0.0, 0.0, 0.0],
+        "Belopp": [129.0, 119.0, 245.5],
+        # Columns without a raw mapping are left out of the payload
+        "Okänd kolumn": ["x", "y", "z"],
+    },
+}
+
+
+def per_row_records(source_bank: str, parsed_df: pd.DataFrame, original_df: pd.DataFrame):
+    """The row-by-row record building prepare_bigquery_data replaced, as the reference."""
+    mapping = upload_transactions.RAW_COLUMN_MAPPINGS[source_bank]
+    raw_columns = {mapping[col]: original_df[col].tolist() for col in original_df.columns if col in mapping}
+    records = []
+    for i, row in parsed_df.iterrows():
+        id_string = (f"{source_bank}_{FILE_HASH}_{i}_{row['ParsedDate']}_"
+                     f"{row['ParsedDescription']}_{row['ParsedAmount']}")
+        digest = hashlib.blake2b(id_string.encode(), digest_size=16).digest()
+        raw_payload = {
+            col_name: upload_transactions._raw_payload_value(col_name, col_values[i])
+            for col_name, col_values in raw_columns.items()
+        }
+        records.append({
+            "transaction_id": int.from_bytes(digest[:8], "big", signed=True),
+            "transaction_id_hi": int.from_bytes(digest[8:], "big", signed=True),
+            "source_bank": source_bank,
+            "file_hash": FILE_HASH,
+            "parsed_date": row['ParsedDate'].date().isoformat(),
+            "year_month": row['ParsedDate'].year * 100 + row['ParsedDate'].month,
+            "parsed_description": str(row['ParsedDescription']),
+            "parsed_amount": upload_transactions._format_numeric(row['ParsedAmount']),
+            "raw_payload": json.dumps(raw_payload, ensure_ascii=False),
+        })
+    return records
+
+
+@pytest.fixture
+def uploader():
+    """A TransactionUploader without a BigQuery client, for the record-building methods."""
+    return object.__new__(upload_transactions.TransactionUploader)
+
+
+@pytest.mark.parametrize("source_bank", sorted(BANK_EXPORTS))
+def test_prepare_bigquery_data_matches_per_row(uploader, source_bank):
+    """Tests that vectorized records match the per-row records for each bank."""
+    original_df = pd.DataFrame(BANK_EXPORTS[source_bank])
+    parsed_df = PARSER_REGISTRY[source_bank](Path(f"{source_bank}.xlsx"), raw_df=original_df)
+    assert parsed_df is not None
+    assert len(parsed_df) < len(original_df)
+
+    expected = per_row_records(source_bank, parsed_df, original_df)
+    records = uploader.prepare_bigquery_data(
+        parsed_df, original_df, source_bank, Path(f"{source_bank}.xlsx"), FILE_HASH
+    )
+
+    assert [(r["transaction_id"], r["transaction_id_hi"]) for r in records] == \
+        [(r["transaction_id"], r["transaction_id_hi"]) for r in expected]
+    assert uploader.create_transaction_ids(source_bank, FILE_HASH, parsed_df) == \
+        [(r["transaction_id"], r["transaction_id_hi"]) for r in expected]
+    assert [list(r["raw_payload"]) for r in records] == \
+        [list(json.loads(r["raw_payload"])) for r in expected]
+    assert [{**r, "raw_payload": json.dumps(r["raw_payload"], ensure_ascii=False)} for r in records] == expected
+
+
+@pytest.mark.parametrize("source_bank", sorted(BANK_EXPORTS))
+def test_iter_record_chunks_matches_per_row(uploader, source_bank):
+    """Tests that streamed chunks hold the per-row records, with raw_payload serialized."""
+    original_df = pd.DataFrame(BANK_EXPORTS[source_bank])
+    parsed_df = PARSER_REGISTRY[source_bank](Path(f"{source_bank}.xlsx"), raw_df=original_df)
+    uploader.chunk_size = 1
+
+    chunks = list(uploader._iter_record_chunks(
+        parsed_df, original_df, source_bank, Path(f"{source_bank}.xlsx"), FILE_HASH
+    ))
+
+    assert [len(chunk) for chunk in chunks] == [1] * len(parsed_df)
+    assert [record for chunk in chunks for record in chunk] == \
+        per_row_records(source_bank, parsed_df, original_df)
+
+
+@pytest.mark.parametrize("encoder", ["json", "orjson"])
+def test_load_job_writes_raw_payload_as_json_object(uploader, monkeypatch, encoder):
+    """Tests that load job NDJSON lines carry raw_payload as an object, not a string."""
+    if encoder == "orjson" and upload_transactions.orjson is None:
+        pytest.skip("orjson is not installed")
+    original_df = pd.DataFrame(BANK_EXPORTS['seb'])
+    parsed_df = PARSER_REGISTRY['seb'](Path("seb.xlsx"), raw_df=original_df)
+    records = uploader.prepare_bigquery_data(parsed_df, original_df, 'seb', Path("seb.xlsx"), FILE_HASH)
+
+    loaded = []
+
+    def load_table_from_file(buffer, table, job_config=None):
+        loaded.extend(buffer.read().splitlines())
+        return SimpleNamespace(result=lambda: None, errors=None)
+
+    uploader.client = SimpleNamespace(load_table_from_file=load_table_from_file)
+    if encoder == "json":
+        monkeypatch.setattr(upload_transactions, "orjson", None)
+
+    errors = uploader._upload_via_load_job(SimpleNamespace(schema=[]), records)
+
+    assert errors == []
+    assert len(loaded) == len(records)
+    for line, record in zip(loaded, records):
+        row = json.loads(line)
+        assert isinstance(row["raw_payload"], dict)
+        assert row["raw_payload"] == record["raw_payload"]
+        assert row["raw_payload"]["seb_text"] == record["parsed_description"]
+
+
+@pytest.mark.parametrize("source_bank", sorted(BANK_EXPORTS))
+def test_map_raw_columns_names(uploader, source_bank):
+    """Tests that only mapped export columns are kept, under their raw names."""
+    original_df = pd.DataFrame(BANK_EXPORTS[source_bank])
+    mapping = upload_transactions.RAW_COLUMN_MAPPINGS[source_bank]
+
+    raw_df = uploader.map_raw_columns(original_df, source_bank)
+
+    assert list(raw_df.columns) == [mapping[col] for col in original_df.columns if col in mapping]
+    assert raw_df.index.equals(original_df.index)
+
+
+def test_file_hash_cache_is_keyed_by_project_and_dataset(tmp_path, monkeypatch):
+    """Tests that hashes cached for one dataset are not seen for another."""
+    monkeypatch.setattr(upload_transactions, "FILE_HASH_CACHE_DIR", tmp_path)
+    test_config = SimpleNamespace(gcp_project_id="project", bigquery_dataset_id="test_dataset")
+    prod_config = SimpleNamespace(gcp_project_id="project", bigquery_dataset_id="prod_dataset")
+
+    upload_transactions.FileHashCache(upload_transactions.file_hash_cache_path(test_config)).add(FILE_HASH)
+
+    assert FILE_HASH in upload_transactions.FileHashCache(upload_transactions.file_hash_cache_path(test_config))
+    assert FILE_HASH not in upload_transactions.FileHashCache(upload_transactions.file_hash_cache_path(prod_config))
+
+
+def test_file_hash_cache_without_path_reads_and_writes_nothing(tmp_path, monkeypatch):
+    """Tests that a cache without a path (--no-cache) stays in memory."""
+    monkeypatch.setattr(upload_transactions, "FILE_HASH_CACHE_DIR", tmp_path)
+    cache = upload_transactions.FileHashCache(None)
+
+    cache.add(FILE_HASH)
+
+    assert FILE_HASH in cache
+    assert list(tmp_path.iterdir()) == []